@@ -0,0 +1,75 @@
+"""
+Benchmark per-request database latency with and without connection reuse.
+
+Simulates requests by sending Django's request_started/request_finished
+signals around a single query, so connection handling follows the same
+CONN_MAX_AGE / health check / pool rules as real requests. Each mode runs
+in a fresh process against the database configured in the environment.
+
+Usage:
+    python benchmarks/bench_db_connections.py --requests 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    'new': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'True'},
+}
+
+
+def run_child(requests):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photo_api.settings')
+    import django
+    django.setup()
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=None)
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+    print(json.dumps(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.requests)
+        return
+
+    print(f'{args.requests} requests per mode, one query each')
+    print(f'{"mode":<12} {"p50 ms":>8} {"p95 ms":>8} {"mean ms":>8}')
+    for mode, env in MODES.items():
+        output = subprocess.run(
+            [sys.executable, __file__, '--requests', str(args.requests), '--child'],
+            env={**os.environ, **env}, check=True, capture_output=True, text=True,
+        ).stdout
+        latencies = sorted(json.loads(output.strip().splitlines()[-1]))
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f'{mode:<12} {statistics.median(latencies):>8.3f} {p95:>8.3f} '
+            f'{statistics.fmean(latencies):>8.3f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
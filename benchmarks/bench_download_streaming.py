@@ -0,0 +1,105 @@
+"""
+Benchmark buffered vs streamed photo downloads.
+
+Serves a random payload from a local HTTP server and stores it through a
+Django FileSystemStorage, standing in for Pexels and S3/MinIO. Each mode
+runs in a fresh process so peak RSS is measured independently.
+
+Usage:
+    python benchmarks/bench_download_streaming.py --size-mb 32
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve(payload):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            view = memoryview(payload)
+            for offset in range(0, len(payload), 64 * 1024):
+                self.wfile.write(view[offset:offset + 64 * 1024])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(mode, url, size_mb):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photo_api.settings')
+    import django
+    django.setup()
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import FileSystemStorage
+    from photos.management.commands.download_photos import Command, stream_response
+
+    session = Command().get_session()
+    with tempfile.TemporaryDirectory() as location:
+        storage = FileSystemStorage(location=location)
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        with session.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            if mode == 'buffered':
+                # The pre-streaming implementation
+                content = b''
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:
+                        content += chunk
+                storage.save('photo.jpg', ContentFile(content))
+            else:
+                storage.save('photo.jpg', stream_response(response, 'photo.jpg'))
+        elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'mode': mode,
+        'mb_per_sec': size_mb / elapsed,
+        'peak_rss_delta_mb': peak_rss_mb() - baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=16)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.size_mb)
+        return
+
+    server = serve(os.urandom(args.size_mb * 1024 * 1024))
+    url = f'http://127.0.0.1:{server.server_address[1]}/photo.jpg'
+    print(f'Payload: {args.size_mb} MB')
+    print(f'{"mode":<10} {"MB/s":>10} {"peak RSS delta (MB)":>20}')
+    for mode in ('buffered', 'streamed'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--size-mb', str(args.size_mb), '--child', mode, url],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{result["mode"]:<10} {result["mb_per_sec"]:>10.1f} {result["peak_rss_delta_mb"]:>20.1f}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
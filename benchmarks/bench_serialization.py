@@ -0,0 +1,92 @@
+"""
+Benchmark PhotoListSerializer vs the values() fast path.
+
+Serializes and renders in-memory rows, so no database is needed: the
+serializer gets unsaved Photo instances and the fast path gets the dicts
+``values()`` would return for them. Both outputs are checked to match.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 20 --repeat 2000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_rows(count):
+    created_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    rows = []
+    for pexels_id in range(1, count + 1):
+        row = {
+            'id': pexels_id,
+            'pexels_id': pexels_id,
+            'width': 1920,
+            'height': 1080,
+            'url': f'https://www.pexels.com/photo/{pexels_id}/',
+            'photographer': 'Test Photographer',
+            'photographer_url': 'https://www.pexels.com/@test',
+            'photographer_id': 1,
+            'avg_color': '#FFFFFF',
+            'alt': f'Photo number {pexels_id}',
+            'image': '',
+            'created_at': created_at + datetime.timedelta(seconds=pexels_id),
+            'is_favorited': bool(pexels_id % 2),
+        }
+        for size in ('medium', 'small', 'tiny'):
+            row[f'src_{size}'] = f'https://images.pexels.com/photos/{pexels_id}/{size}.jpeg'
+        rows.append(row)
+    return rows
+
+
+def measure(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20, help='Rows per page')
+    parser.add_argument('--repeat', type=int, default=2000, help='Pages per mode')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photo_api.settings')
+    import django
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+    from photos.fastpath import RowPlan
+    from photos.models import Photo
+    from photos.renderers import FastJSONRenderer, orjson
+    from photos.serializers import PhotoListSerializer
+
+    rows = make_rows(args.rows)
+    photos = []
+    for row in rows:
+        photo = Photo(**{key: value for key, value in row.items() if key != 'is_favorited'})
+        photo.is_favorited = row['is_favorited']
+        photos.append(photo)
+
+    def serializer():
+        return JSONRenderer().render(PhotoListSerializer(photos, many=True).data)
+
+    def fast_path():
+        return FastJSONRenderer().render(RowPlan(PhotoListSerializer).rows(rows))
+
+    assert serializer() == fast_path(), 'fast path output differs'
+
+    print(f'Page: {args.rows} rows, {args.repeat} pages per mode, orjson: {orjson is not None}')
+    print(f'{"mode":<12} {"rows/sec":>12} {"speedup":>8}')
+    baseline = None
+    for name, func in (('serializer', serializer), ('fast path', fast_path)):
+        rate = args.rows * args.repeat / measure(func, args.repeat)
+        baseline = baseline or rate
+        print(f'{name:<12} {rate:>12,.0f} {rate / baseline:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,16 @@ Pytest configuration and fixtures.
 """
 import os
 import django
+import pytest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photo_api.settings')
 django.setup()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Keep cached responses and catalog versions from leaking between tests."""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PhotoApiConfig(AppConfig):
+    name = 'photo_api'
+    verbose_name = 'Photo API'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,91 @@
+"""
+JWT authentication that resolves users from a short-lived cache.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every request.
+``CachedJWTAuthentication`` keeps each user's fields (everything but the
+password hash and ``last_login``, which are loaded on access) in the cache
+for ``AUTH_USER_CACHE_TIMEOUT`` seconds; saving or deleting the user drops
+the entry (see photo_api.signals). Changes made with ``QuerySet.update()`` are
+seen once the entry expires.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+UNCACHED_FIELDS = {'password', 'last_login'}
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def cached_field_names(user_model):
+    return [
+        field.attname for field in user_model._meta.concrete_fields
+        if field.attname not in UNCACHED_FIELDS
+    ]
+
+
+def forget_user(user_id):
+    """Drop a user's cached fields."""
+    cache.delete(user_cache_key(user_id))
+
+
+def touch_last_login(user):
+    """
+    Record a login, at most once per ``AUTH_LAST_LOGIN_INTERVAL`` seconds
+    per user. Returns whether ``last_login`` was written.
+    """
+    interval = getattr(settings, 'AUTH_LAST_LOGIN_INTERVAL', 300)
+    if interval and not cache.add(f'auth:last_login:{user.pk}', True, timeout=interval):
+        return False
+    user.last_login = timezone.now()
+    # update() skips post_save, so the cached user (which has no last_login) stays
+    type(user)._default_manager.filter(pk=user.pk).update(last_login=user.last_login)
+    return True
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that reads users through the cache."""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != 'id':
+            # Revocation compares the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user_model = get_user_model()
+        names = cached_field_names(user_model)
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = user_model._default_manager.filter(pk=user_id).values_list(*names).first()
+            if values is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(key, values, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+
+        # Uncached fields are deferred and load from the database if accessed
+        user = user_model.from_db(DEFAULT_DB_ALIAS, names, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class ThrottledTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair serializer that throttles ``last_login`` writes."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        touch_last_login(self.user)
+        return data
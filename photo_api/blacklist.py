@@ -0,0 +1,155 @@
+"""
+Refresh-token blacklist checks through an in-memory Bloom filter.
+
+simplejwt's blacklist queries ``BlacklistedToken`` for every refresh. Here
+each process keeps a Bloom filter of revoked JTIs and only queries the
+database when the filter reports a probable hit, i.e. for revoked tokens
+and about ``JWT_BLACKLIST_FILTER_ERROR_RATE`` of the others.
+
+The filter is rebuilt from unexpired entries every
+``JWT_BLACKLIST_FILTER_TTL`` seconds. In between, committing a blacklisted
+token bumps a version in the cache, and processes that see a new version
+add the rows blacklisted since their last load, less
+``JWT_BLACKLIST_FILTER_MARGIN`` seconds. Loading by time rather than by id
+keeps rows that commit out of id order; the query uses the
+``blacklisted_at`` index from photo_api's migrations and runs outside the
+filter's lock, so checks in other threads go on meanwhile. Use a shared cache backend so
+every process sees the bumps; with a per-process cache other processes see
+new revocations on their next rebuild.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+BLACKLIST_VERSION_KEY = 'auth:blacklist-version'
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, value):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+
+def get_blacklist_version():
+    """Return the current blacklist version, initializing it if needed."""
+    version = cache.get(BLACKLIST_VERSION_KEY)
+    if version is None:
+        cache.add(BLACKLIST_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(BLACKLIST_VERSION_KEY)
+    return version
+
+
+def bump_blacklist_version():
+    """Tell every process to load newly blacklisted tokens."""
+    try:
+        cache.incr(BLACKLIST_VERSION_KEY)
+    except ValueError:
+        get_blacklist_version()
+
+
+class RevokedTokenFilter:
+    """A process's Bloom filter of blacklisted JTIs, kept current lazily."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.built_at = 0
+        self.version = None
+        self.loaded_at = None
+
+    def rebuild(self, version):
+        revoked = BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        # Room for the tokens revoked before the next rebuild
+        bloom = BloomFilter(
+            revoked.count() * 2 + 1024,
+            getattr(settings, 'JWT_BLACKLIST_FILTER_ERROR_RATE', 0.001),
+        )
+        # Rows that commit during the query are caught by the next load's margin
+        loaded_at = aware_utcnow()
+        for jti in revoked.values_list('token__jti', flat=True).iterator():
+            bloom.add(jti)
+        self.bloom = bloom
+        self.built_at = time.monotonic()
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def load_since(self, bloom, since, version):
+        """Add the rows blacklisted since ``since`` to ``bloom``."""
+        loaded_at = aware_utcnow()
+        jtis = list(
+            BlacklistedToken.objects.filter(blacklisted_at__gte=since).values_list('token__jti', flat=True)
+        )
+        with self.lock:
+            if self.bloom is not bloom:
+                return  # Rebuilt meanwhile, from a later snapshot
+            for jti in jtis:
+                bloom.add(jti)
+            self.loaded_at = max(self.loaded_at, loaded_at)
+            self.version = version
+
+    def refresh(self):
+        version = get_blacklist_version()
+        ttl = getattr(settings, 'JWT_BLACKLIST_FILTER_TTL', 300)
+        with self.lock:
+            if self.bloom is None or time.monotonic() - self.built_at >= ttl:
+                self.rebuild(version)
+                return
+            if version == self.version:
+                return
+            margin = timedelta(seconds=getattr(settings, 'JWT_BLACKLIST_FILTER_MARGIN', 60))
+            bloom, since = self.bloom, self.loaded_at - margin
+        self.load_since(bloom, since, version)
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self.bloom
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+
+
+revoked_tokens = RevokedTokenFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check goes through ``revoked_tokens``."""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if revoked_tokens.might_contain(jti) and BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_('Token is blacklisted'))
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
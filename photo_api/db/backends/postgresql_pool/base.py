@@ -0,0 +1,78 @@
+"""
+PostgreSQL backend that checks connections out of a psycopg 3 pool.
+
+Django opens a connection per request (or per CONN_MAX_AGE) and closes it
+afterwards; this backend turns that close into a return to a per-process
+``psycopg_pool.ConnectionPool``, so requests skip TCP, TLS and auth setup.
+Pool settings come from the database's ``POOL`` dict (``min_size``,
+``max_size``, ``timeout``, ...). Use it with ``CONN_MAX_AGE = 0``.
+"""
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+
+    def get_pool(self, conn_params):
+        """Return this process's pool for the current connection settings."""
+        settings_dict = self.settings_dict
+        key = (
+            self.alias, settings_dict['NAME'], settings_dict['USER'],
+            settings_dict['HOST'], settings_dict['PORT'],
+        )
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    kwargs=conn_params,
+                    check=ConnectionPool.check_connection,
+                    name=f'django-{self.alias}',
+                    open=True,
+                    **settings_dict.get('POOL', {}),
+                )
+                _pools[key] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            self.isolation_level = IsolationLevel(
+                IsolationLevel.READ_COMMITTED if isolation_level is None else isolation_level
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {isolation_level} specified. '
+                f'Use one of the psycopg.IsolationLevel values.'
+            )
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.getconn()
+        # Pooled connections keep whatever level their previous user set
+        connection.isolation_level = None if isolation_level is None else self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # The pool rolls back anything left open and discards broken connections
+                return self.pool.putconn(self.connection)
+
+
+def close_pools():
+    """Close every pool in this process, e.g. before forking workers."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Forked processes (e.g. multiprocessing workers) must not inherit pooled sockets
+os.register_at_fork(before=close_pools)
@@ -0,0 +1,22 @@
+# Generated manually for the incremental revoked-token filter loads
+
+from django.db import migrations
+
+# token_blacklist belongs to simplejwt, so its index is added here. The
+# revoked-token filter loads rows by blacklisted_at (see photo_api.blacklist).
+CREATE_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS token_blacklist_blacklistedtoken_blacklisted_at '
+    'ON token_blacklist_blacklistedtoken (blacklisted_at)'
+)
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS token_blacklist_blacklistedtoken_blacklisted_at'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX_SQL, DROP_INDEX_SQL),
+    ]
@@ -0,0 +1,87 @@
+"""
+Primary/replica database routing.
+
+Reads go to an alias from settings.DATABASE_REPLICAS, chosen at random once
+per request; writes go to the primary. Once a request writes, its later reads are pinned to the
+primary too, so it always reads its own writes. So are reads inside a
+transaction on the primary.
+
+Only safe HTTP requests are unpinned (by ReplicaPinningMiddleware); management
+commands, worker threads and the shell read from the primary, as replica
+lag would break their read-then-write loops.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_pinned = ContextVar('pinned_to_primary', default=True)
+
+_replica = ContextVar('replica', default=None)
+
+
+def pin():
+    """Send every read in the current context to the primary from now on."""
+    _pinned.set(True)
+
+
+@contextmanager
+def replica_reads():
+    """Let reads inside the block use one replica until something writes."""
+    available = replicas()
+    if not available:
+        yield
+        return
+    replica_token = _replica.set(random.choice(available))
+    token = _pinned.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+        _replica.reset(replica_token)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    """Route reads to replicas unless the current context needs the primary."""
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Let safe (GET, HEAD, OPTIONS) requests read from replicas until they
+    write; other requests use the primary throughout.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            return self.get_response(request)
+        with replica_reads():
+            return self.get_response(request)
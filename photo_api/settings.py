@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from datetime import timedelta
+from boto3.s3.transfer import TransferConfig
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,11 +31,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'drf_yasg',
     'storages',
+    'photo_api',
     'photos',
 ]
 
@@ -47,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'photo_api.routers.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'photo_api.urls'
@@ -71,9 +76,14 @@ WSGI_APPLICATION = 'photo_api.wsgi.application'
 
 
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DB_POOL=True checks connections out of a psycopg pool per process
+# (photo_api.db.backends.postgresql_pool); otherwise connections persist for
+# DB_CONN_MAX_AGE seconds. Either way they are health-checked before reuse.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'photo_api.db.backends.postgresql_pool' if DB_POOL else 'django.db.backends.postgresql',
         'NAME': os.getenv('DB_NAME', 'photo_api'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', 'postgres'),
@@ -82,9 +92,35 @@ DATABASES = {
         'OPTIONS': {
             'connect_timeout': 10,
         },
+        # The pool keeps connections itself, so Django hands them back after each request
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'POOL': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        },
     }
 }
 
+# Read replicas (comma-separated DB_REPLICA_HOSTS, host or host:port). List,
+# detail, search and export reads are spread across them; writes, and reads
+# that follow a write in the same request, use the primary (see
+# photo_api.routers). Tests run replicas as mirrors of the test database.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['photo_api.routers.PrimaryReplicaRouter']
+
 
 
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,10 +163,41 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend such as Redis so every process sees catalog version bumps)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'photo-api'),
+    }
+}
+
+# Seconds photo list/detail responses stay cached (0 disables). Keep it well
+# below AWS_QUERYSTRING_EXPIRE - AWS_S3_URL_CACHE_WINDOW so cached image URLs
+# are still valid when served.
+PHOTO_RESPONSE_CACHE_TIMEOUT = int(os.getenv('PHOTO_RESPONSE_CACHE_TIMEOUT', 300))
+
+# Serialize photo list and favorites pages from values() rows instead of
+# PhotoListSerializer instances (same output, see photos.fastpath)
+PHOTO_FAST_SERIALIZATION = os.getenv('PHOTO_FAST_SERIALIZATION', 'True') == 'True'
+
+# Unfiltered photo lists above this many rows report the planner's estimate
+# (pg_class.reltuples) as their count instead of running COUNT(*)
+PHOTO_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('PHOTO_ESTIMATED_COUNT_THRESHOLD', 100000))
+
+# Renditions made by `manage.py generate_renditions`: every format at every
+# width (originals are never upscaled), encoded at PHOTO_RENDITION_QUALITY
+PHOTO_RENDITION_WIDTHS = [int(width) for width in os.getenv('PHOTO_RENDITION_WIDTHS', '320,640,1280').split(',')]
+PHOTO_RENDITION_FORMATS = os.getenv('PHOTO_RENDITION_FORMATS', 'webp,jpeg').split(',')
+PHOTO_RENDITION_QUALITY = int(os.getenv('PHOTO_RENDITION_QUALITY', 80))
+
+# Rows fetched per server-side cursor round trip by /api/photos/export/
+PHOTO_EXPORT_CHUNK_SIZE = int(os.getenv('PHOTO_EXPORT_CHUNK_SIZE', 2000))
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'photo_api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -150,12 +217,29 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is written by ThrottledTokenObtainPairSerializer instead
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_OBTAIN_SERIALIZER': 'photo_api.authentication.ThrottledTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'photo_api.blacklist.FilteredTokenRefreshSerializer',
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Seconds an authenticated user's fields are cached (see photo_api.authentication),
+# and the minimum seconds between last_login writes for one user
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+AUTH_LAST_LOGIN_INTERVAL = int(os.getenv('AUTH_LAST_LOGIN_INTERVAL', 300))
+
+# Refresh-token blacklist checks go through a per-process Bloom filter of
+# revoked JTIs, rebuilt every JWT_BLACKLIST_FILTER_TTL seconds (see
+# photo_api.blacklist). Expired tokens are removed by `manage.py prune_tokens`.
+JWT_BLACKLIST_FILTER_TTL = int(os.getenv('JWT_BLACKLIST_FILTER_TTL', 300))
+JWT_BLACKLIST_FILTER_ERROR_RATE = float(os.getenv('JWT_BLACKLIST_FILTER_ERROR_RATE', 0.001))
+# Incremental loads re-read rows blacklisted this many seconds before the
+# previous load, covering slow commits and clock skew between app servers
+JWT_BLACKLIST_FILTER_MARGIN = int(os.getenv('JWT_BLACKLIST_FILTER_MARGIN', 60))
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -187,11 +271,22 @@ AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 AWS_QUERYSTRING_AUTH = True
 AWS_S3_CUSTOM_DOMAIN = None
+# Presigned URLs are reused within windows of this many seconds (see photos.storage)
+AWS_QUERYSTRING_EXPIRE = int(os.getenv('AWS_QUERYSTRING_EXPIRE', 3600))
+AWS_S3_URL_CACHE_WINDOW = int(os.getenv('AWS_S3_URL_CACHE_WINDOW', AWS_QUERYSTRING_EXPIRE // 2))
+AWS_S3_URL_CACHE_SIZE = int(os.getenv('AWS_S3_URL_CACHE_SIZE', 10000))
+# Objects above the threshold are uploaded as multipart uploads, read from
+# the source stream one part at a time
+AWS_S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.getenv('AWS_S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024)),
+    multipart_chunksize=int(os.getenv('AWS_S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024)),
+    max_concurrency=int(os.getenv('AWS_S3_MAX_CONCURRENCY', 4)),
+)
 
 # Storage configuration
 STORAGES = {
     'default': {
-        'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+        'BACKEND': 'photos.storage.CachedSignedURLS3Storage',
     },
     'staticfiles': {
         'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
@@ -0,0 +1,29 @@
+"""
+Signal handlers for project-level authentication state.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import UNCACHED_FIELDS, forget_user
+from .blacklist import bump_blacklist_version
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    """Drop the user's cached authentication state once the change commits."""
+    if update_fields is not None and set(update_fields) <= UNCACHED_FIELDS:
+        return
+    transaction.on_commit(partial(forget_user, instance.pk))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def announce_blacklisted_token(sender, created, **kwargs):
+    """Have every process add the token to its revoked-token filter, once it is visible."""
+    if created:
+        transaction.on_commit(bump_blacklist_version)
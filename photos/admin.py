@@ -2,7 +2,8 @@
 Admin configuration for photos app.
 """
 from django.contrib import admin
-from .models import Photo, PhotoFavorite
+from .models import Photo, PhotoDownload, PhotoFavorite, PhotoRendition
+from .pagination import EstimatedCountPaginator
 
 
 @admin.register(Photo)
@@ -11,6 +12,9 @@ class PhotoAdmin(admin.ModelAdmin):
     list_filter = ('photographer', 'created_at')
     search_fields = ('pexels_id', 'photographer', 'alt')
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    # Skip the extra unfiltered COUNT(*) shown next to filtered results
+    show_full_result_count = False
 
 
 @admin.register(PhotoFavorite)
@@ -18,3 +22,19 @@ class PhotoFavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'photo', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'photo__pexels_id')
+
+
+@admin.register(PhotoDownload)
+class PhotoDownloadAdmin(admin.ModelAdmin):
+    list_display = ('photo', 'size', 'status', 'attempts', 'updated_at')
+    list_filter = ('status', 'size')
+    search_fields = ('photo__pexels_id',)
+    raw_id_fields = ('photo',)
+
+
+@admin.register(PhotoRendition)
+class PhotoRenditionAdmin(admin.ModelAdmin):
+    list_display = ('photo', 'format', 'target_width', 'width', 'height', 'size', 'created_at')
+    list_filter = ('format', 'target_width')
+    search_fields = ('photo__pexels_id',)
+    raw_id_fields = ('photo',)
@@ -0,0 +1,68 @@
+"""
+Versioned response cache for the photo catalog.
+
+Cached responses are keyed by a global catalog version, so a single bump
+invalidates every entry at once instead of tracking which pages a change
+touches. Favorite state is overlaid after a cache read instead: the
+per-user ``is_favorited`` so one cached page serves every user, and
+``favorite_count`` so favoriting never invalidates the whole catalog.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Photo
+
+CATALOG_VERSION_KEY = 'photos:catalog-version'
+
+
+def get_catalog_version():
+    """Return the current catalog version, initializing it if needed."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so a version evicted from the
+        # cache never comes back with a value that older entries used.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def response_cache_timeout():
+    return getattr(settings, 'PHOTO_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def response_cache_key(action, request):
+    """Cache key for an ``action`` response to ``request`` at the current version."""
+    uri = request.build_absolute_uri()
+    digest = hashlib.sha256(f'{action}:{uri}'.encode()).hexdigest()
+    return f'photos:response:{get_catalog_version()}:{digest}'
+
+
+def overlay_favorites(photos, user):
+    """
+    Set ``favorite_count`` and ``is_favorited`` on serialized ``photos``.
+
+    Both come from one query for ``user``; a field left out by ``?fields=``
+    stays out.
+    """
+    fields = [field for field in ('favorite_count', 'is_favorited') if photos and field in photos[0]]
+    if not fields:
+        return
+    current = {
+        photo_id: values
+        for photo_id, *values in Photo.objects.filter(id__in=[photo['id'] for photo in photos])
+        .with_favorited(user).values_list('id', *fields)
+    }
+    for photo in photos:
+        # A photo deleted since the page was cached keeps its cached values
+        photo.update(zip(fields, current.get(photo['id'], ())))
@@ -0,0 +1,116 @@
+"""
+Conditional GET support for photo endpoints.
+
+Validators come from small queries on Photo.updated_at and the user's
+FavoritesVersion, so a request whose If-None-Match or If-Modified-Since
+still matches is answered with 304 before anything is serialized.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db.models import BooleanField, F, Max, Subquery, Value
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import FavoritesVersion, PhotoFavorite
+
+
+def bump_favorites_version(user_id):
+    """Record that a user's set of favorites changed."""
+    now = timezone.now()
+    changes = {'version': F('version') + 1, 'changed_at': now}
+    if not FavoritesVersion.objects.filter(user_id=user_id).update(**changes):
+        _, created = FavoritesVersion.objects.get_or_create(
+            user_id=user_id, defaults={'version': 1, 'changed_at': now}
+        )
+        if not created:
+            FavoritesVersion.objects.filter(user_id=user_id).update(**changes)
+
+
+def make_etag(*parts):
+    """Strong ETag over the given validator parts."""
+    return '"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def url_window():
+    """
+    Start of the current presigned URL window, or None.
+
+    Image URLs are only stable within a window of the storage's URL cache
+    (see photos.storage), so validators roll over with it.
+    """
+    window = getattr(default_storage, 'url_cache_window', None)
+    if not window:
+        return None
+    return datetime.fromtimestamp(time.time() // window * window, tz=dt_timezone.utc)
+
+
+def latest(*moments):
+    return max(moment for moment in moments if moment is not None)
+
+
+def photo_validators(queryset, pk, request):
+    """
+    ETag and Last-Modified for one photo, or None if it is not in ``queryset``.
+
+    ``queryset`` is annotated with ``is_favorited`` for the request user
+    unless the response leaves that field out.
+    """
+    if 'is_favorited' not in queryset.query.annotations:
+        queryset = queryset.annotate(is_favorited=Value(None, output_field=BooleanField()))
+    try:
+        row = queryset.filter(pk=pk).annotate(
+            favorites_changed_at=Subquery(
+                FavoritesVersion.objects.filter(user_id=request.user.pk).values('changed_at')
+            )
+        ).values_list('updated_at', 'favorite_count', 'is_favorited', 'favorites_changed_at').first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+    if row is None:
+        return None
+    updated_at, favorite_count, is_favorited, favorites_changed_at = row
+    window = url_window()
+    etag = make_etag(
+        'photo', pk, updated_at, favorite_count, is_favorited, window, request.get_full_path()
+    )
+    return etag, latest(updated_at, favorites_changed_at, window)
+
+
+def favorites_validators(request):
+    """ETag and Last-Modified for a page of the user's favorites."""
+    version, changed_at = FavoritesVersion.objects.filter(
+        user_id=request.user.pk
+    ).values_list('version', 'changed_at').first() or (0, None)
+    photos_updated_at = PhotoFavorite.objects.filter(
+        user_id=request.user.pk
+    ).aggregate(updated_at=Max('photo__updated_at'))['updated_at']
+    window = url_window()
+    etag = make_etag('favorites', version, photos_updated_at, window, request.get_full_path())
+    last_modified = latest(
+        changed_at, photos_updated_at, window, datetime.fromtimestamp(0, tz=dt_timezone.utc)
+    )
+    return etag, last_modified
+
+
+def conditional_response(request, validators, respond):
+    """
+    Return 304 if ``validators`` match the request, else ``respond()``.
+
+    Responses carry the validators and must be revalidated on every use,
+    since they depend on the user's favorites.
+    """
+    etag, last_modified = validators
+    timestamp = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = respond()
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+    return response
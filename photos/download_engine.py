@@ -0,0 +1,144 @@
+"""
+Asyncio download engine with per-host connection caps and adaptive concurrency.
+
+The event loop only schedules work: fetching, storing and saving a photo go
+through blocking libraries (requests, boto3, the ORM), so each job runs on a
+worker thread while the loop enforces the concurrency limits.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+_DONE = object()
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    A fast success raises the limit by ``1 / limit``, about +1 per round of
+    completions. A failure or a response slower than ``latency_target``
+    multiplies it by ``decrease``, at most once per ``latency_target``
+    seconds so one burst of errors counts as a single congestion signal.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, latency_target=2.0, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, ok):
+        async with self._condition:
+            self.in_flight -= 1
+            if ok and latency <= self.latency_target:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.latency_target:
+                    self._last_decrease = now
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+            self._condition.notify_all()
+
+
+class DownloadEngine:
+    """
+    Run a blocking ``handler(item) -> (success, error, latency)`` over ``items``.
+
+    Items are pulled lazily into a bounded queue, so memory stays constant
+    however many photos are pending. At most ``per_host`` jobs target the
+    same host at once, and the total is governed by an ``AIMDLimiter``.
+    The limiter judges the ``latency`` the handler reports, e.g. just the
+    remote server's response time, or the whole call when it is None.
+    ``on_result(item, success, error)`` is called on the event loop thread.
+    ``thread_cleanup`` runs once on every worker thread after the run, e.g.
+    to close per-thread database connections.
+    """
+
+    def __init__(self, handler, url_for, *, initial_concurrency=8, max_concurrency=64,
+                 per_host=8, queue_size=256, latency_target=2.0, thread_cleanup=None):
+        self.handler = handler
+        self.url_for = url_for
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.queue_size = queue_size
+        self.latency_target = latency_target
+        self.thread_cleanup = thread_cleanup
+        self.limiter = None
+
+    def run(self, items, on_result):
+        asyncio.run(self._run(items, on_result))
+
+    async def _run(self, items, on_result):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        host_slots = {}
+        self.limiter = AIMDLimiter(
+            initial=self.initial_concurrency,
+            maximum=self.max_concurrency,
+            latency_target=self.latency_target,
+        )
+
+        # One thread per possible job plus one for the producer
+        with ThreadPoolExecutor(max_workers=self.max_concurrency + 1) as executor:
+            async def produce():
+                iterator = iter(items)
+                while True:
+                    item = await loop.run_in_executor(executor, next, iterator, _DONE)
+                    if item is _DONE:
+                        break
+                    await queue.put(item)
+                for _ in range(self.max_concurrency):
+                    await queue.put(_DONE)
+
+            async def work():
+                while True:
+                    item = await queue.get()
+                    if item is _DONE:
+                        return
+                    host = urlsplit(self.url_for(item) or '').netloc
+                    slots = host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+                    async with slots:
+                        await self.limiter.acquire()
+                        started = time.monotonic()
+                        try:
+                            success, error, latency = await loop.run_in_executor(
+                                executor, self.handler, item
+                            )
+                        except Exception as e:
+                            success, error, latency = False, str(e), None
+                        if latency is None:
+                            latency = time.monotonic() - started
+                        await self.limiter.release(latency, success)
+                    on_result(item, success, error)
+
+            try:
+                await asyncio.gather(produce(), *(work() for _ in range(self.max_concurrency)))
+            finally:
+                if self.thread_cleanup is not None:
+                    run_on_every_thread(executor, self.max_concurrency + 1, self.thread_cleanup)
+
+
+def run_on_every_thread(executor, thread_count, func):
+    """Run ``func`` once on each of an executor's ``thread_count`` threads."""
+    # The barrier keeps every call blocked until all of them have started,
+    # so no thread can pick up a second call.
+    barrier = threading.Barrier(thread_count)
+
+    def call():
+        barrier.wait()
+        func()
+
+    wait([executor.submit(call) for _ in range(thread_count)])
@@ -0,0 +1,102 @@
+"""
+Persistent download manifest for download_photos.
+
+Each photo gets a PhotoDownload row recording its status, attempt count and
+last error, so reruns skip finished and permanently failed photos. Uploads
+orphaned by a crash between the storage write and the database save are
+re-attached from one bulk listing of the storage prefix.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Photo, PhotoDownload
+
+# Must match Photo.image's upload_to
+IMAGE_DIRECTORY = 'photos'
+
+# <pexels_id>_<size>.jpg, plus the suffix storage adds to avoid overwrites
+STORED_NAME_RE = re.compile(r'^(?P<pexels_id>\d+)_(?P<size>[a-z0-9]+)(?:_[A-Za-z0-9]{7})?\.jpg$')
+
+
+def pending_photos():
+    """Photos without an image that are neither downloaded nor permanently failed."""
+    return Photo.objects.filter(image='').exclude(
+        download__status__in=[PhotoDownload.Status.DONE, PhotoDownload.Status.FAILED]
+    )
+
+
+def record_attempt(photo, size, error=None, max_attempts=3):
+    """
+    Record one download attempt for ``photo``.
+
+    A successful attempt marks the job done; after ``max_attempts`` failed
+    attempts it is marked as permanently failed.
+    """
+    if error is None:
+        status = Value(PhotoDownload.Status.DONE)
+    else:
+        status = Case(
+            When(attempts__gte=max_attempts - 1, then=Value(PhotoDownload.Status.FAILED)),
+            default=Value(PhotoDownload.Status.PENDING),
+        )
+    updated = PhotoDownload.objects.filter(photo=photo).update(
+        size=size,
+        status=status,
+        attempts=F('attempts') + 1,
+        last_error=error or '',
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        if error is None:
+            initial_status = PhotoDownload.Status.DONE
+        elif max_attempts <= 1:
+            initial_status = PhotoDownload.Status.FAILED
+        else:
+            initial_status = PhotoDownload.Status.PENDING
+        PhotoDownload.objects.create(
+            photo=photo, size=size, status=initial_status, attempts=1, last_error=error or ''
+        )
+
+
+def reconcile(storage, size, batch_size=1000):
+    """
+    Attach stored images of ``size`` to photos whose image field is still empty.
+
+    Lists the image directory once (S3 pages through it 1000 keys per
+    request) instead of issuing a HEAD request per photo. Returns the number
+    of photos repaired.
+    """
+    _, filenames = storage.listdir(IMAGE_DIRECTORY)
+    orphans = {}
+    for filename in filenames:
+        match = STORED_NAME_RE.match(filename)
+        if match and match['size'] == size:
+            orphans.setdefault(int(match['pexels_id']), f'{IMAGE_DIRECTORY}/{filename}')
+
+    repaired = 0
+    pexels_ids = list(orphans)
+    for start in range(0, len(pexels_ids), batch_size):
+        with transaction.atomic():
+            photos = list(
+                Photo.objects.filter(image='', pexels_id__in=pexels_ids[start:start + batch_size])
+            )
+            now = timezone.now()
+            for photo in photos:
+                photo.image = orphans[photo.pexels_id]
+                # Changes the photo's validators, so conditional GETs see the image
+                photo.updated_at = now
+            Photo.objects.bulk_update(photos, ['image', 'updated_at'])
+            PhotoDownload.objects.bulk_create(
+                [
+                    PhotoDownload(photo=photo, size=size, status=PhotoDownload.Status.DONE)
+                    for photo in photos
+                ],
+                update_conflicts=True,
+                unique_fields=['photo'],
+                update_fields=['size', 'status', 'updated_at'],
+            )
+        repaired += len(photos)
+    return repaired
@@ -0,0 +1,63 @@
+"""
+Streaming NDJSON export of the photo catalog.
+"""
+import zlib
+
+from .renderers import FastJSONRenderer
+
+
+def ndjson_chunks(values, plan, chunk_size):
+    """
+    Yield NDJSON for ``values`` rows, ``chunk_size`` lines at a time.
+
+    ``values`` is read through a server-side cursor, so memory stays
+    bounded by one chunk however large the catalog is.
+    """
+    render = FastJSONRenderer().render
+    lines = []
+    for row in plan.iter_rows(values.iterator(chunk_size=chunk_size)):
+        lines.append(render(row))
+        if len(lines) >= chunk_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def gzip_chunks(chunks):
+    """Gzip a byte stream chunk by chunk."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accept_encoding_qualities(header):
+    """Map each content coding in an Accept-Encoding header to its q-value."""
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def accepts_gzip(request):
+    """Whether the client accepts gzip; ``gzip;q=0`` is a refusal."""
+    qualities = accept_encoding_qualities(request.headers.get('Accept-Encoding', ''))
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
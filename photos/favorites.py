@@ -0,0 +1,62 @@
+"""
+Bulk favorite changes for offline sync.
+
+Each operation runs a constant number of queries however many photos it
+touches. Bulk writes skip model signals, so the user's FavoritesVersion
+is bumped here, once per call that changes something.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .conditional import bump_favorites_version
+from .models import Photo, PhotoFavorite
+
+ADDED = 'added'
+ALREADY_FAVORITED = 'already_favorited'
+REMOVED = 'removed'
+NOT_FAVORITED = 'not_favorited'
+NOT_FOUND = 'not_found'
+
+
+def add_favorites(user, photo_ids):
+    """Favorite ``photo_ids`` for ``user``; return a status per ID."""
+    table = PhotoFavorite._meta.db_table
+    with transaction.atomic():
+        found = set(Photo.objects.filter(id__in=photo_ids).values_list('id', flat=True))
+        added = set()
+        if found:
+            # Report only the rows this INSERT wrote, so a favorite added by a
+            # concurrent request is neither counted twice nor reported as added
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (user_id, photo_id, created_at) '
+                    f'SELECT %s, photo_id, %s FROM unnest(%s::bigint[]) AS photo_id '
+                    f'ON CONFLICT (user_id, photo_id) DO NOTHING RETURNING photo_id',
+                    [user.pk, timezone.now(), list(found)],
+                )
+                added = {row[0] for row in cursor.fetchall()}
+        if added:
+            Photo.objects.filter(id__in=added).adjust_favorite_count(1)
+            bump_favorites_version(user.pk)
+    return {
+        photo_id: ADDED if photo_id in added else ALREADY_FAVORITED if photo_id in found else NOT_FOUND
+        for photo_id in photo_ids
+    }
+
+
+def remove_favorites(user, photo_ids):
+    """Unfavorite ``photo_ids`` for ``user``; return a status per ID."""
+    table = PhotoFavorite._meta.db_table
+    with transaction.atomic():
+        # One DELETE that reports what it removed; QuerySet.delete() would
+        # load every row to send post_delete signals
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id = %s AND photo_id = ANY(%s) RETURNING photo_id',
+                [user.pk, list(photo_ids)],
+            )
+            removed = {row[0] for row in cursor.fetchall()}
+        if removed:
+            Photo.objects.filter(id__in=removed).adjust_favorite_count(-1)
+            bump_favorites_version(user.pk)
+    return {photo_id: REMOVED if photo_id in removed else NOT_FAVORITED for photo_id in photo_ids}
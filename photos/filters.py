@@ -0,0 +1,77 @@
+"""
+Filter backends for the photo API.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import SEARCH_CONFIG
+
+SEARCH_TOKEN_RE = re.compile(r'\w+')
+
+# Largest value that fits the photographer_id integer column
+MAX_PHOTOGRAPHER_ID = 2 ** 31 - 1
+
+# ?photographer_match= modes and the lookup each one uses. ``contains`` is
+# served by the pg_trgm index, ``prefix`` by the varchar_pattern_ops index
+# Django adds for db_index=True and ``exact`` by the B-tree index; the two
+# fast paths are case-sensitive.
+PHOTOGRAPHER_MATCH_LOOKUPS = {
+    'contains': 'photographer__icontains',
+    'prefix': 'photographer__startswith',
+    'exact': 'photographer',
+}
+
+
+class PhotoOrderingFilter(filters.OrderingFilter):
+    """
+    ``OrderingFilter`` that breaks ties on ``id``.
+
+    ``?ordering=-favorite_count`` has many ties; ordering them by ``id`` in
+    the same direction keeps pages stable and matches the
+    (favorite_count, id) index.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering = [*ordering, '-id' if ordering[-1].startswith('-') else 'id']
+        return ordering
+
+
+class PhotoSearchFilter(filters.SearchFilter):
+    """
+    Full-text search over ``Photo.search_vector``.
+
+    Every term must match, each term also matches as a prefix, and a numeric
+    term may instead match ``photographer_id`` exactly. Results are ranked by
+    relevance unless the client asks for an explicit ``?ordering=``, so this
+    backend must run after ``OrderingFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        tokens = SEARCH_TOKEN_RE.findall(' '.join(self.get_search_terms(request)))
+        if not tokens:
+            return queryset
+
+        query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens),
+            search_type='raw',
+            config=SEARCH_CONFIG,
+        )
+        condition = Q()
+        for token in tokens:
+            term = Q(search_vector=SearchQuery(f'{token}:*', search_type='raw', config=SEARCH_CONFIG))
+            if token.isascii() and token.isdigit() and int(token) <= MAX_PHOTOGRAPHER_ID:
+                term |= Q(photographer_id=int(token))
+            condition &= term
+
+        queryset = queryset.filter(condition).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
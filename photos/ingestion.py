@@ -0,0 +1,193 @@
+"""
+Helpers for ingesting photo rows from the Pexels CSV export.
+"""
+import csv
+import json
+import os
+
+from django.db import transaction
+
+from .models import Photo
+from .renditions import pexels_rendition_index, refresh_rendition_index
+from .workers import chunk_result, record_error
+
+# Photo columns written from a CSV row (everything except the lookup key)
+PHOTO_DATA_FIELDS = (
+    'width', 'height', 'url',
+    'photographer', 'photographer_url', 'photographer_id',
+    'avg_color', 'alt',
+    'src_original', 'src_large2x', 'src_large', 'src_medium',
+    'src_small', 'src_portrait', 'src_landscape', 'src_tiny',
+)
+
+
+def parse_row(row):
+    """
+    Convert a CSV row into Photo field values.
+
+    Raises ValueError or KeyError for malformed rows.
+    """
+    return {
+        'pexels_id': int(row['id']),
+        'width': int(row['width']),
+        'height': int(row['height']),
+        'url': row['url'],
+        'photographer': row['photographer'],
+        'photographer_url': row['photographer_url'],
+        'photographer_id': int(row['photographer_id']),
+        'avg_color': row['avg_color'],
+        'alt': row.get('alt', ''),
+        'src_original': row['src.original'],
+        'src_large2x': row['src.large2x'],
+        'src_large': row['src.large'],
+        'src_medium': row['src.medium'],
+        'src_small': row['src.small'],
+        'src_portrait': row['src.portrait'],
+        'src_landscape': row['src.landscape'],
+        'src_tiny': row['src.tiny'],
+    }
+
+
+def upsert_photos(rows, update_existing=False):
+    """
+    Write a batch of parsed rows with a single INSERT ... ON CONFLICT.
+
+    Existing photos are updated when ``update_existing`` is set and left
+    untouched otherwise. Rows repeating a pexels_id within the batch collapse
+    to the last occurrence. Returns ``(created, updated, skipped)``.
+    """
+    by_pexels_id = {row['pexels_id']: row for row in rows}
+    duplicates = len(rows) - len(by_pexels_id)
+    existing = set(
+        Photo.objects.filter(pexels_id__in=by_pexels_id).values_list('pexels_id', flat=True)
+    )
+    photos = [
+        Photo(**row, rendition_index=pexels_rendition_index(row)) for row in by_pexels_id.values()
+    ]
+
+    if update_existing:
+        Photo.objects.bulk_create(
+            photos,
+            update_conflicts=True,
+            unique_fields=['pexels_id'],
+            update_fields=[*PHOTO_DATA_FIELDS, 'updated_at'],
+        )
+        written = by_pexels_id.keys()
+        # Keep stored renditions in the index of photos that already existed
+        refresh_rendition_index(Photo.objects.filter(pexels_id__in=existing))
+    else:
+        Photo.objects.bulk_create(photos, ignore_conflicts=True)
+        written = by_pexels_id.keys() - existing
+    Photo.objects.filter(pexels_id__in=written).update_search_vector()
+
+    created = len(by_pexels_id) - len(existing)
+    if update_existing:
+        return created, len(existing) + duplicates, 0
+    return created, 0, len(existing) + duplicates
+
+
+def plan_chunks(path, chunk_size):
+    """
+    Split the CSV body into byte ranges of roughly ``chunk_size`` bytes.
+
+    Ranges start and end on line boundaries, so quoted fields must not
+    contain newlines (the Pexels export has none). Returns
+    ``(header, [(start, end), ...])``.
+    """
+    with open(path, 'rb') as file:
+        header = next(csv.reader([file.readline().decode('utf-8')]))
+        size = os.fstat(file.fileno()).st_size
+        chunks = []
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()
+            end = file.tell()
+            chunks.append((start, end))
+            start = end
+    return header, chunks
+
+
+def read_chunk(path, header, start, end):
+    """Yield parsed CSV rows between two byte offsets without loading the whole range."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        lines = (file.readline().decode('utf-8') for _ in iter(lambda: file.tell() < end, False))
+        yield from csv.DictReader(lines, fieldnames=header)
+
+
+def ingest_chunk(task):
+    """
+    Parse, validate and upsert one byte range in its own transaction.
+
+    ``task`` is ``(index, path, header, start, end, update_existing, batch_size)``.
+    Runs in pool workers, so bad rows are returned as counters and messages
+    instead of being raised.
+    """
+    index, path, header, start, end, update_existing, batch_size = task
+    result = chunk_result(index, 'rows', 'created', 'updated', 'skipped')
+
+    def flush(batch):
+        created, updated, skipped = upsert_photos(batch, update_existing)
+        result['created'] += created
+        result['updated'] += updated
+        result['skipped'] += skipped
+
+    with transaction.atomic():
+        batch = []
+        for line_num, row in enumerate(read_chunk(path, header, start, end), start=1):
+            result['rows'] += 1
+            try:
+                batch.append(parse_row(row))
+            except (ValueError, KeyError) as e:
+                record_error(result, f'Chunk {index + 1} line {line_num}: {str(e)}')
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    return result
+
+
+class Checkpoint:
+    """
+    JSON file recording which chunks of a CSV file have been committed.
+
+    The file is tied to the CSV's size, mtime and the chunk size, so a
+    changed input or chunking starts from scratch instead of resuming.
+    """
+
+    def __init__(self, path, csv_path, chunk_size):
+        stat = os.stat(csv_path)
+        self.path = path
+        self.fingerprint = {
+            'source': os.path.abspath(csv_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'chunk_size': chunk_size,
+        }
+        self.done = set()
+
+    def load(self):
+        """Load finished chunks; returns False if there was nothing to resume."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get('fingerprint') != self.fingerprint:
+            return False
+        self.done = set(data.get('done', []))
+        return bool(self.done)
+
+    def mark_done(self, index):
+        self.done.add(index)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'fingerprint': self.fingerprint, 'done': sorted(self.done)}, file)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,10 +1,28 @@
+import time
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import connections
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from photos.models import Photo
+from photos.cache import bump_catalog_version
+from photos.download_engine import DownloadEngine, run_on_every_thread
+from photos.download_manifest import pending_photos, reconcile, record_attempt
+from photos.models import PhotoDownload
+
+
+def stream_response(response, name):
+    """
+    Wrap a streamed response body as a File.
+
+    Storage backends read it part by part (S3 switches to a multipart upload
+    above AWS_S3_TRANSFER_CONFIG's threshold), so the image is never held in
+    memory as a whole.
+    """
+    response.raw.decode_content = True
+    return File(response.raw, name=name)
 
 
 class Command(BaseCommand):
@@ -28,10 +46,51 @@ class Command(BaseCommand):
             '--workers',
             type=int,
             default=5,
-            help='Number of concurrent download workers'
+            help='Number of concurrent download workers (initial concurrency with --engine async)'
+        )
+        parser.add_argument(
+            '--engine',
+            type=str,
+            default='threads',
+            choices=['threads', 'async'],
+            help='Fixed thread pool, or asyncio scheduling with adaptive concurrency'
+        )
+        parser.add_argument(
+            '--max-concurrency',
+            type=int,
+            default=64,
+            help='Upper bound for adaptive concurrency with --engine async'
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=8,
+            help='Maximum concurrent connections per host with --engine async'
+        )
+        parser.add_argument(
+            '--latency-target',
+            type=float,
+            default=2.0,
+            help='Pexels response time in seconds above which --engine async lowers its concurrency'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=3,
+            help='Mark a photo as permanently failed after this many failed attempts'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Reset permanently failed photos so they are attempted again'
+        )
+        parser.add_argument(
+            '--reconcile',
+            action='store_true',
+            help='Attach images already in storage to photos before downloading'
         )
 
-    def get_session(self):
+    def get_session(self, pool_maxsize=10):
         """Create a requests session with retry logic."""
         session = requests.Session()
         retry = Retry(
@@ -40,44 +99,77 @@ class Command(BaseCommand):
             status_forcelist=[500, 502, 503, 504],
             allowed_methods=["GET"]
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
         session.mount('http://', adapter)
         session.mount('https://', adapter)
         return session
 
     def download_photo(self, photo, size, session):
-        """Download a single photo."""
+        """
+        Download a single photo and record the attempt in the manifest.
+
+        Returns ``(success, error, latency)``, see ``fetch_photo``.
+        """
+        success, error, latency = self.fetch_photo(photo, size, session)
+        try:
+            record_attempt(photo, size, error, self.max_attempts)
+        except Exception as e:
+            return False, f'Could not record download: {str(e)}', latency
+        return success, error, latency
+
+    def fetch_photo(self, photo, size, session):
+        """
+        Download a single photo.
+
+        ``latency`` is the time until Pexels sent the response headers, or
+        None if no request was made. The body streams into storage, so the
+        total time also depends on the upload.
+        """
+        latency = None
         try:
             url = getattr(photo, f'src_{size}', None)
             
             if not url:
-                return False, f'No URL for size {size}'
+                return False, f'No URL for size {size}', latency
             
-            # Stream download for large files
-            response = session.get(url, timeout=30, stream=True)
-            response.raise_for_status()
+            # Stream download straight into S3/MinIO
+            with session.get(url, timeout=30, stream=True) as response:
+                latency = response.elapsed.total_seconds()
+                response.raise_for_status()
+                filename = f'{photo.pexels_id}_{size}.jpg'
+                photo.image.save(filename, stream_response(response, filename), save=False)
+                photo.save(update_fields=['image', 'updated_at'])
             
-            # Read content in chunks
-            content = b''
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    content += chunk
-            
-            # Save to S3/MinIO
-            filename = f'{photo.pexels_id}_{size}.jpg'
-            photo.image.save(filename, ContentFile(content), save=True)
-            
-            return True, None
+            return True, None, latency
             
         except Exception as e:
-            return False, str(e)
+            return False, str(e), latency
 
     def handle(self, *args, **options):
         size = options['size']
         limit = options['limit']
         workers = options['workers']
+        self.max_attempts = options['max_attempts']
+
+        if options['latency_target'] <= 0:
+            raise CommandError('--latency-target must be positive')
+
+        if options['retry_failed']:
+            reset = PhotoDownload.objects.filter(
+                status=PhotoDownload.Status.FAILED
+            ).update(status=PhotoDownload.Status.PENDING, attempts=0)
+            self.stdout.write(f'Reset {reset} failed downloads')
 
-        photos = Photo.objects.filter(image='')
+        if options['reconcile']:
+            repaired = reconcile(default_storage, size)
+            bump_catalog_version()
+            self.stdout.write(f'Reconciled {repaired} photos with images already in storage')
+
+        if options['engine'] == 'async':
+            self.handle_async(size, limit, workers, options)
+            return
+
+        photos = pending_photos()
         if limit:
             photos = photos[:limit]
 
@@ -97,7 +189,7 @@ class Command(BaseCommand):
             for future in as_completed(future_to_photo):
                 photo = future_to_photo[future]
                 try:
-                    success, error = future.result()
+                    success, error, _ = future.result()
                     if success:
                         downloaded += 1
                         if downloaded % 10 == 0:
@@ -113,6 +205,9 @@ class Command(BaseCommand):
                         self.style.ERROR(f'Error photo {photo.pexels_id}: {str(e)}')
                     )
 
+            # Worker threads opened their own database connections
+            run_on_every_thread(executor, workers, connections.close_all)
+
         session.close()
         
         self.stdout.write(
@@ -122,3 +217,66 @@ class Command(BaseCommand):
                 f'  Failed: {failed}'
             )
         )
+
+    def iter_pending_photos(self, limit, batch_size=500):
+        """Yield pending photos, one keyset-paginated batch at a time."""
+        last_pk = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            count = batch_size if remaining is None else min(batch_size, remaining)
+            batch = list(
+                pending_photos().filter(pk__gt=last_pk).order_by('pk')[:count]
+            )
+            if not batch:
+                return
+            yield from batch
+            last_pk = batch[-1].pk
+            if remaining is not None:
+                remaining -= len(batch)
+
+    def handle_async(self, size, limit, workers, options):
+        per_host = options['per_host']
+        session = self.get_session(pool_maxsize=per_host)
+        engine = DownloadEngine(
+            lambda photo: self.download_photo(photo, size, session),
+            lambda photo: getattr(photo, f'src_{size}', None),
+            initial_concurrency=workers,
+            max_concurrency=max(options['max_concurrency'], workers),
+            per_host=per_host,
+            latency_target=options['latency_target'],
+            thread_cleanup=connections.close_all,
+        )
+        self.stdout.write(
+            f'Downloading photos at size: {size} with the async engine '
+            f'({workers} initial, {engine.max_concurrency} max, {per_host} per host)'
+        )
+
+        counts = {'downloaded': 0, 'failed': 0}
+
+        def on_result(photo, success, error):
+            if success:
+                counts['downloaded'] += 1
+                if counts['downloaded'] % 10 == 0:
+                    self.stdout.write(
+                        f'Downloaded {counts["downloaded"]}... '
+                        f'(concurrency limit {int(engine.limiter.limit)})'
+                    )
+            else:
+                counts['failed'] += 1
+                self.stdout.write(
+                    self.style.WARNING(f'Failed photo {photo.pexels_id}: {error}')
+                )
+
+        started = time.monotonic()
+        engine.run(self.iter_pending_photos(limit), on_result)
+        session.close()
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nDownload complete!\n'
+                f'  Downloaded: {counts["downloaded"]}\n'
+                f'  Failed: {counts["failed"]}\n'
+                f'  Throughput: {counts["downloaded"] / elapsed:.1f} photos/sec'
+            )
+        )
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from photos.cache import bump_catalog_version
+from photos.models import PhotoRendition
+from photos.renditions import generate_chunk, pending_photos, rendition_specs
+from photos.workers import MAX_REPORTED_ERRORS, init_worker
+
+
+def comma_separated(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Generate resized renditions of stored photos across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: one per CPU; 1 runs in this process)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20,
+            help='Photos per worker task'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Limit number of photos to process'
+        )
+        parser.add_argument(
+            '--widths',
+            type=comma_separated,
+            default=None,
+            help='Comma-separated widths (default: PHOTO_RENDITION_WIDTHS)'
+        )
+        parser.add_argument(
+            '--formats',
+            type=comma_separated,
+            default=None,
+            help=f'Comma-separated formats from {", ".join(PhotoRendition.Format.values)} '
+                 f'(default: PHOTO_RENDITION_FORMATS)'
+        )
+        parser.add_argument(
+            '--quality',
+            type=int,
+            default=None,
+            help='Encoder quality, 1-100 (default: PHOTO_RENDITION_QUALITY)'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        if workers < 1 or chunk_size < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+        try:
+            widths = [int(width) for width in options['widths']] if options['widths'] else None
+        except ValueError:
+            raise CommandError('--widths must be integers')
+        if widths and min(widths) < 1:
+            raise CommandError('--widths must be positive')
+        formats = options['formats']
+        if formats and set(formats) - set(PhotoRendition.Format.values):
+            raise CommandError(f'--formats must be from: {", ".join(PhotoRendition.Format.values)}')
+        quality = options['quality'] or getattr(settings, 'PHOTO_RENDITION_QUALITY', 80)
+        specs = rendition_specs(widths, formats)
+
+        photo_ids = list(pending_photos(specs).order_by('id').values_list('id', flat=True))
+        if options['limit']:
+            photo_ids = photo_ids[:options['limit']]
+        tasks = [
+            (index, photo_ids[start:start + chunk_size], specs, quality)
+            for index, start in enumerate(range(0, len(photo_ids), chunk_size))
+        ]
+        self.stdout.write(
+            f'Generating {len(specs)} renditions each for {len(photo_ids)} photos '
+            f'with {workers} workers'
+        )
+
+        totals = {'photos': 0, 'renditions': 0, 'error_count': 0, 'cpu_seconds': 0.0}
+        errors = []
+        started = time.monotonic()
+
+        def record(result):
+            for key in totals:
+                totals[key] += result[key]
+            errors.extend(result['errors'])
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f'Chunk {result["index"] + 1}/{len(tasks)} done: {result["photos"]} photos '
+                f'({totals["photos"] / elapsed:,.1f} images/sec overall)'
+            )
+
+        if workers == 1:
+            for task in tasks:
+                record(generate_chunk(task))
+        else:
+            # Workers open their own connections; never share the parent's socket
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+                for result in pool.imap_unordered(generate_chunk, tasks):
+                    record(result)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        # Rendition indexes are bulk updated, bypassing the Photo signals
+        if totals['photos']:
+            bump_catalog_version()
+        per_core = totals['photos'] / totals['cpu_seconds'] if totals['cpu_seconds'] else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'\nRenditions complete!\n'
+            f'  Photos: {totals["photos"]}\n'
+            f'  Renditions: {totals["renditions"]}\n'
+            f'  Errors: {totals["error_count"]}\n'
+            f'  Throughput: {totals["photos"] / elapsed:,.1f} images/sec in {elapsed:.1f}s, '
+            f'{totals["photos"] / elapsed / workers:,.1f} images/sec per core, '
+            f'{per_core:,.1f} images per CPU-second'
+        ))
+        if errors:
+            self.stdout.write(self.style.ERROR('\nErrors encountered:'))
+            for error in errors[:MAX_REPORTED_ERRORS]:
+                self.stdout.write(self.style.ERROR(f'  {error}'))
@@ -2,10 +2,15 @@
 Management command to ingest photos from CSV file.
 """
 import csv
+import multiprocessing
 import os
-from django.core.management.base import BaseCommand
-from django.db import transaction
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from photos.cache import bump_catalog_version
+from photos.ingestion import Checkpoint, ingest_chunk, parse_row, plan_chunks, upsert_photos
 from photos.models import Photo
+from photos.workers import init_worker
 
 
 class Command(BaseCommand):
@@ -22,10 +27,44 @@ class Command(BaseCommand):
             action='store_true',
             help='Update existing photos if they already exist',
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Upsert rows in batches with one INSERT ... ON CONFLICT per batch',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows per batch in bulk mode',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Ingest byte-range chunks in this many worker processes, '
+                 'committing each chunk separately (implies --bulk)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=32 * 1024 * 1024,
+            help='Approximate chunk size in bytes when --workers is set',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help='Checkpoint file for resuming with --workers (default: <csv_file>.checkpoint)',
+        )
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
         update_existing = options['update']
+        bulk = options['bulk']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
 
         if not os.path.exists(csv_file_path):
             self.stdout.write(
@@ -35,6 +74,10 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Reading photos from {csv_file_path}...')
 
+        if options['workers'] is not None:
+            self.handle_pipeline(csv_file_path, update_existing, batch_size, options)
+            return
+
         photos_created = 0
         photos_updated = 0
         photos_skipped = 0
@@ -45,67 +88,145 @@ class Command(BaseCommand):
                 reader = csv.DictReader(file)
                 
                 with transaction.atomic():
+                    batch = []
                     for row_num, row in enumerate(reader, start=2):  # Start at 2 (header is row 1)
                         try:
-                            pexels_id = int(row['id'])
-                            
-                            photo_data = {
-                                'pexels_id': pexels_id,
-                                'width': int(row['width']),
-                                'height': int(row['height']),
-                                'url': row['url'],
-                                'photographer': row['photographer'],
-                                'photographer_url': row['photographer_url'],
-                                'photographer_id': int(row['photographer_id']),
-                                'avg_color': row['avg_color'],
-                                'alt': row.get('alt', ''),
-                                'src_original': row['src.original'],
-                                'src_large2x': row['src.large2x'],
-                                'src_large': row['src.large'],
-                                'src_medium': row['src.medium'],
-                                'src_small': row['src.small'],
-                                'src_portrait': row['src.portrait'],
-                                'src_landscape': row['src.landscape'],
-                                'src_tiny': row['src.tiny'],
-                            }
-                            
-                            photo, created = Photo.objects.update_or_create(
-                                pexels_id=pexels_id,
-                                defaults=photo_data
-                            )
-                            
-                            if created:
-                                photos_created += 1
-                            elif update_existing:
-                                photos_updated += 1
-                            else:
-                                photos_skipped += 1
-                                
+                            photo_data = parse_row(row)
                         except (ValueError, KeyError) as e:
                             errors.append(f'Row {row_num}: {str(e)}')
                             self.stdout.write(
                                 self.style.WARNING(f'Error processing row {row_num}: {str(e)}')
                             )
+                            continue
+                        
+                        if bulk:
+                            batch.append(photo_data)
+                            if len(batch) >= batch_size:
+                                created, updated, skipped = upsert_photos(batch, update_existing)
+                                photos_created += created
+                                photos_updated += updated
+                                photos_skipped += skipped
+                                batch = []
+                            continue
+                        
+                        photo, created = Photo.objects.update_or_create(
+                            pexels_id=photo_data['pexels_id'],
+                            defaults=photo_data
+                        )
+                        
+                        if created:
+                            photos_created += 1
+                        elif update_existing:
+                            photos_updated += 1
+                        else:
+                            photos_skipped += 1
+                    
+                    if batch:
+                        created, updated, skipped = upsert_photos(batch, update_existing)
+                        photos_created += created
+                        photos_updated += updated
+                        photos_skipped += skipped
 
-            self.stdout.write(self.style.SUCCESS(
-                f'\nIngestion complete!\n'
-                f'  Created: {photos_created}\n'
-                f'  Updated: {photos_updated}\n'
-                f'  Skipped: {photos_skipped}\n'
-                f'  Errors: {len(errors)}'
-            ))
-
-            if errors:
-                self.stdout.write(self.style.ERROR('\nErrors encountered:'))
-                for error in errors[:10]:  # Show first 10 errors
-                    self.stdout.write(self.style.ERROR(f'  {error}'))
-                if len(errors) > 10:
-                    self.stdout.write(
-                        self.style.ERROR(f'  ... and {len(errors) - 10} more errors')
-                    )
+            bump_catalog_version()
+            self.write_summary(
+                photos_created, photos_updated, photos_skipped, len(errors), errors
+            )
 
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Failed to process CSV file: {str(e)}')
             )
             raise
+
+    def handle_pipeline(self, csv_file_path, update_existing, batch_size, options):
+        """Ingest the file as independently committed chunks, resuming from a checkpoint."""
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        if workers < 1 or chunk_size < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+
+        header, chunks = plan_chunks(csv_file_path, chunk_size)
+        checkpoint = Checkpoint(
+            options['checkpoint'] or f'{csv_file_path}.checkpoint', csv_file_path, chunk_size
+        )
+        if checkpoint.load():
+            self.stdout.write(
+                f'Resuming from {checkpoint.path}: '
+                f'{len(checkpoint.done)}/{len(chunks)} chunks already committed'
+            )
+        tasks = [
+            (index, csv_file_path, header, start, end, update_existing, batch_size)
+            for index, (start, end) in enumerate(chunks)
+            if index not in checkpoint.done
+        ]
+        self.stdout.write(f'Ingesting {len(tasks)} chunks with {workers} workers')
+
+        totals = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'error_count': 0}
+        errors = []
+        failed_chunks = 0
+        started = time.monotonic()
+
+        def record(result):
+            checkpoint.mark_done(result['index'])
+            for key in totals:
+                totals[key] += result[key]
+            errors.extend(result['errors'])
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f'Chunk {result["index"] + 1}/{len(chunks)} committed: '
+                f'{result["rows"]} rows ({totals["rows"] / elapsed:,.0f} rows/sec overall)'
+            )
+
+        if workers == 1:
+            for task in tasks:
+                try:
+                    record(ingest_chunk(task))
+                except Exception as e:
+                    failed_chunks += 1
+                    self.stdout.write(self.style.ERROR(f'Chunk {task[0] + 1} failed: {str(e)}'))
+        else:
+            # Workers open their own connections; never share the parent's socket
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+                pending = {task[0]: pool.apply_async(ingest_chunk, (task,)) for task in tasks}
+                for index, async_result in pending.items():
+                    try:
+                        record(async_result.get())
+                    except Exception as e:
+                        failed_chunks += 1
+                        self.stdout.write(self.style.ERROR(f'Chunk {index + 1} failed: {str(e)}'))
+
+        elapsed = time.monotonic() - started
+        # Bulk upserts bypass the Photo signals; committed chunks count even if others failed
+        bump_catalog_version()
+        self.write_summary(
+            totals['created'], totals['updated'], totals['skipped'], totals['error_count'], errors
+        )
+        self.stdout.write(
+            f'  Rows: {totals["rows"]} in {elapsed:.1f}s '
+            f'({totals["rows"] / max(elapsed, 1e-9):,.0f} rows/sec)'
+        )
+        if failed_chunks:
+            raise CommandError(
+                f'{failed_chunks} chunks failed; rerun the same command to resume '
+                f'from {checkpoint.path}'
+            )
+        checkpoint.remove()
+
+    def write_summary(self, created, updated, skipped, error_count, errors):
+        self.stdout.write(self.style.SUCCESS(
+            f'\nIngestion complete!\n'
+            f'  Created: {created}\n'
+            f'  Updated: {updated}\n'
+            f'  Skipped: {skipped}\n'
+            f'  Errors: {error_count}'
+        ))
+
+        if errors:
+            self.stdout.write(self.style.ERROR('\nErrors encountered:'))
+            for error in errors[:10]:  # Show first 10 errors
+                self.stdout.write(self.style.ERROR(f'  {error}'))
+            if error_count > 10:
+                self.stdout.write(
+                    self.style.ERROR(f'  ... and {error_count - 10} more errors')
+                )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Tokens deleted per statement'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        expired = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).order_by()
+        total = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            # Blacklist rows first, so neither delete has to cascade row by row
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            total += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {total} expired tokens'))
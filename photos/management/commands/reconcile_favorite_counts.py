@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from photos.cache import bump_catalog_version
+from photos.models import Photo, PhotoFavorite
+
+
+class Command(BaseCommand):
+    help = 'Recount Photo.favorite_count from PhotoFavorite rows and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Photos recounted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            with transaction.atomic():
+                # Locking the batch makes concurrent favorites wait, so their
+                # F() increments apply on top of the recounted value
+                rows = list(
+                    Photo.objects.select_for_update().filter(id__gt=last_id)
+                    .order_by('id').values_list('id', 'favorite_count')[:batch_size]
+                )
+                if not rows:
+                    break
+                first_id, last_id = rows[0][0], rows[-1][0]
+                counts = dict(
+                    PhotoFavorite.objects.filter(photo_id__gte=first_id, photo_id__lte=last_id)
+                    .order_by().values_list('photo_id').annotate(Count('id'))
+                )
+                now = timezone.now()
+                drifted = [
+                    Photo(id=photo_id, favorite_count=counts.get(photo_id, 0), updated_at=now)
+                    for photo_id, favorite_count in rows
+                    if counts.get(photo_id, 0) != favorite_count
+                ]
+                Photo.objects.bulk_update(drifted, ['favorite_count', 'updated_at'])
+            checked += len(rows)
+            fixed += len(drifted)
+
+        if fixed:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} photos, fixed {fixed} favorite counts'
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0002_rename_photos_phot_pexels__idx_photos_phot_pexels__a46ae3_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='photo',
+            name='photos_phot_created_84134a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['created_at', 'id'], name='photos_phot_created_cf67ae_idx'),
+        ),
+    ]
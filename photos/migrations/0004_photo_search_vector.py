@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def populate_search_vector(apps, schema_editor):
+    Photo = apps.get_model('photos', 'Photo')
+    Photo.objects.update(
+        search_vector=(
+            SearchVector('photographer', weight='A', config='english')
+            + SearchVector('alt', weight='B', config='english')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0003_photo_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='photos_phot_search__af1097_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated manually for the trigram photographer index
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Django's icontains compiles to UPPER(col) LIKE UPPER(pattern), so the index
+# is built over the same expression for the planner to match it.
+CREATE_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS photos_photo_photographer_trgm '
+    'ON photos_photo USING gin (UPPER(photographer) gin_trgm_ops)'
+)
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS photos_photo_photographer_trgm'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0004_photo_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_INDEX_SQL, DROP_INDEX_SQL),
+    ]
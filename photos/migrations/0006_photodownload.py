@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0005_photo_photographer_trgm_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoDownload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(help_text='Pexels size that was downloaded', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('image', '')), fields=['id'], name='photos_photo_missing_image'),
+        ),
+        migrations.AddField(
+            model_name='photodownload',
+            name='photo',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='download', to='photos.photo'),
+        ),
+        migrations.AddIndex(
+            model_name='photodownload',
+            index=models.Index(fields=['status'], name='photos_phot_status_6c7a07_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_favorite_count(apps, schema_editor):
+    Photo = apps.get_model('photos', 'Photo')
+    PhotoFavorite = apps.get_model('photos', 'PhotoFavorite')
+    counts = PhotoFavorite.objects.filter(photo=OuterRef('pk')).order_by().values('photo').annotate(
+        count=Count('*')
+    ).values('count')
+    Photo.objects.filter(favorited_by__isnull=False).update(favorite_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0007_favoritesversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['favorite_count', 'id'], name='photos_phot_favorit_eba2a3_idx'),
+        ),
+        migrations.RunPython(populate_favorite_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0008_photo_favorite_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('target_width', models.PositiveIntegerField(help_text='Configured width this rendition was made for')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('file', models.FileField(max_length=255, upload_to='renditions/')),
+                ('size', models.PositiveIntegerField(help_text='File size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='photos.photo')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='photorendition',
+            constraint=models.UniqueConstraint(fields=('photo', 'format', 'target_width'), name='unique_photo_rendition'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:34
+
+from collections import defaultdict
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Frozen copies of photos.renditions as of this migration
+PEXELS_SIZE_FIELDS = ('src_original', 'src_large2x', 'src_large', 'src_medium', 'src_small')
+PREFERRED_FORMATS = ('webp', 'jpeg')
+
+
+def pexels_width(url, width, height):
+    params = {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+    if params.get('fit') == 'crop':
+        return None
+    try:
+        scale = min(
+            1,
+            int(params['w']) / width if 'w' in params else 1,
+            int(params['h']) / height if 'h' in params else 1,
+        )
+        return round(width * scale * float(params.get('dpr', 1)))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def build_rendition_index(width, height, pexels_urls, stored):
+    entries = {}
+    for url in pexels_urls:
+        served_width = pexels_width(url, width, height) if url else None
+        if served_width:
+            entries.setdefault(served_width, {'w': served_width, 'url': url})
+    rank = {image_format: index for index, image_format in enumerate(PREFERRED_FORMATS)}
+    for _, stored_width, name in sorted(stored, key=lambda item: rank.get(item[0], len(rank))):
+        entry = entries.get(stored_width)
+        if entry is None or 'url' in entry:
+            entries[stored_width] = {'w': stored_width, 'name': name}
+    return [entries[key] for key in sorted(entries)]
+
+
+def populate_rendition_index(apps, schema_editor):
+    Photo = apps.get_model('photos', 'Photo')
+    PhotoRendition = apps.get_model('photos', 'PhotoRendition')
+    stored = defaultdict(set)
+    for photo_id, image_format, width, name in PhotoRendition.objects.values_list(
+        'photo_id', 'format', 'width', 'file'
+    ):
+        stored[photo_id].add((image_format, width, name))
+    batch = []
+    for photo in Photo.objects.only('id', 'width', 'height', *PEXELS_SIZE_FIELDS).iterator(BATCH_SIZE):
+        photo.rendition_index = build_rendition_index(
+            photo.width, photo.height,
+            [getattr(photo, field) for field in PEXELS_SIZE_FIELDS],
+            stored[photo.pk],
+        )
+        batch.append(photo)
+        if len(batch) == BATCH_SIZE:
+            Photo.objects.bulk_update(batch, ['rendition_index'])
+            batch = []
+    Photo.objects.bulk_update(batch, ['rendition_index'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0009_photorendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='rendition_index',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(populate_rendition_index, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,53 @@
 Photo models for the photo management API.
 """
 from django.db import models
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.utils import timezone
+
+# Text search configuration shared by the stored vector and search queries
+SEARCH_CONFIG = 'english'
+
+
+class PhotoQuerySet(models.QuerySet):
+    """QuerySet helpers for photos."""
+
+    def with_favorited(self, user):
+        """
+        Annotate ``is_favorited`` for ``user``.
+
+        Uses a single EXISTS subquery so a whole page resolves its favorite
+        flags in the same query that loads the photos.
+        """
+        if user is None or not user.is_authenticated:
+            return self.annotate(is_favorited=models.Value(False))
+        return self.annotate(
+            is_favorited=models.Exists(
+                PhotoFavorite.objects.filter(user=user, photo=models.OuterRef('pk'))
+            )
+        )
+    
+    def adjust_favorite_count(self, delta):
+        """
+        Add ``delta`` to ``favorite_count`` in one UPDATE, never going below zero.
+
+        Also sets ``updated_at``, so conditional GETs see the new count.
+        """
+        return self.update(
+            favorite_count=Greatest(models.F('favorite_count') + delta, 0),
+            updated_at=timezone.now(),
+        )
+    
+    def update_search_vector(self):
+        """Recompute ``search_vector`` from ``photographer`` and ``alt`` in one UPDATE."""
+        return self.update(
+            search_vector=(
+                SearchVector('photographer', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('alt', weight='B', config=SEARCH_CONFIG)
+            )
+        )
 
 
 class Photo(models.Model):
@@ -23,9 +69,21 @@ class Photo(models.Model):
     avg_color = models.CharField(max_length=7, help_text="Average color hex code")
     alt = models.TextField(blank=True, help_text="Photo alt text/description")
     
+    # Full-text search document over photographer and alt, see update_search_vector()
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    # Number of PhotoFavorite rows, kept by PhotoViewSet.favorite (fix drift
+    # with the reconcile_favorite_counts command)
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Stored image file
     image = models.ImageField(upload_to='photos/', null=True, blank=True)
     
+    # Available sizes for best-fit selection and srcset, widest last:
+    # [{"w": 640, "name": <storage name>} or {"w": 975, "url": <Pexels URL>}, ...]
+    # Maintained by photos.renditions.refresh_rendition_index().
+    rendition_index = models.JSONField(default=list, editable=False)
+    
     # Original Pexels URLs for reference
     src_original = models.URLField(max_length=500)
     src_large2x = models.URLField(max_length=500)
@@ -40,17 +98,50 @@ class Photo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PhotoQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['pexels_id']),
             models.Index(fields=['photographer']),
             models.Index(fields=['photographer_id']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['favorite_count', 'id']),
+            GinIndex(fields=['search_vector']),
+            # Photos still waiting for download_photos
+            models.Index(fields=['id'], condition=models.Q(image=''), name='photos_photo_missing_image'),
+            # photos_photo_photographer_trgm (pg_trgm over UPPER(photographer))
+            # is created in migration 0005 because it needs the extension.
         ]
     
     def __str__(self):
         return f"Photo {self.pexels_id} by {self.photographer}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._stored_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+    
+    def has_changed(self, fields):
+        """
+        Whether any of ``fields`` may differ from the stored row.
+
+        Compares with the values loaded from or last saved to the database,
+        so post_save handlers can skip saves that leave their sources alone.
+        """
+        stored = getattr(self, '_stored_values', None)
+        if stored is None:
+            return True
+        return any(field not in stored or getattr(self, field) != stored[field] for field in fields)
 
 
 class PhotoFavorite(models.Model):
@@ -70,3 +161,71 @@ class PhotoFavorite(models.Model):
     
     def __str__(self):
         return f"{self.user.username} favorited photo {self.photo.pexels_id}"
+
+
+class PhotoDownload(models.Model):
+    """
+    Download job state for a photo, used by download_photos to resume.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+    
+    photo = models.OneToOneField(Photo, on_delete=models.CASCADE, related_name='download')
+    size = models.CharField(max_length=20, help_text="Pexels size that was downloaded")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+    
+    def __str__(self):
+        return f"Download of photo {self.photo_id} ({self.status})"
+
+
+class FavoritesVersion(models.Model):
+    """
+    Change counter for a user's favorites, used to validate conditional GETs.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='favorites_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Favorites of user {self.user_id} at version {self.version}"
+
+
+class PhotoRendition(models.Model):
+    """
+    A resized copy of a photo's stored image, made by generate_renditions.
+    """
+    class Format(models.TextChoices):
+        WEBP = 'webp', 'WebP'
+        JPEG = 'jpeg', 'JPEG'
+    
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='renditions')
+    format = models.CharField(max_length=10, choices=Format.choices)
+    target_width = models.PositiveIntegerField(help_text="Configured width this rendition was made for")
+    # Smaller than target_width when the original is narrower (never upscaled)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(upload_to='renditions/', max_length=255)
+    size = models.PositiveIntegerField(help_text="File size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['photo', 'format', 'target_width'], name='unique_photo_rendition'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.format} {self.width}w rendition of photo {self.photo_id}"
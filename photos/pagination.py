@@ -0,0 +1,135 @@
+"""
+Pagination classes for the photo API.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate for an unfiltered queryset, or None.
+
+    Reads ``pg_class.reltuples``, which ANALYZE and autovacuum keep close
+    to the table size, instead of scanning the table. Returns None when
+    the queryset is filtered or the table has not been analyzed yet.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.combinator or query.is_sliced:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that estimates the count of large, unfiltered querysets.
+
+    Above PHOTO_ESTIMATED_COUNT_THRESHOLD rows the planner estimate is
+    used instead of COUNT(*); ``count_is_exact`` tells which one it was.
+    Small or filtered result sets are always counted exactly.
+
+    The estimate lags behind bulk inserts until the next ANALYZE, so it is
+    not trusted as a bound: a page past its end, or a full page at its end,
+    falls back to an exact count.
+    """
+    count_is_exact = True
+    force_exact_count = False
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, 'PHOTO_ESTIMATED_COUNT_THRESHOLD', 100000)
+        estimate = None
+        if not self.force_exact_count and hasattr(self.object_list, 'query'):
+            estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= threshold:
+            self.count_is_exact = False
+            return estimate
+        return super().count
+
+    def count_exactly(self):
+        """Replace an estimated count with COUNT(*)."""
+        self.force_exact_count = True
+        self.count_is_exact = True
+        for name in ('count', 'num_pages'):
+            self.__dict__.pop(name, None)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_is_exact:
+                raise
+        self.count_exactly()
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+        # Slice a full page even past the estimate, which may be too low
+        bottom = (number - 1) * self.per_page
+        page = self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+        if number == self.num_pages and len(page) == self.per_page:
+            # More rows may follow; count them so has_next() is right
+            self.count_exactly()
+        return page
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Page number pagination that reports whether ``count`` is exact."""
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return response_schema
+
+
+class PhotoCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (created_at, id) index.
+
+    Opt-in alternative to page numbers: no OFFSET scan and no COUNT(*),
+    so deep pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+
+
+class FavoriteCursorPagination(PhotoCursorPagination):
+    """
+    Keyset pagination over a user's PhotoFavorite rows.
+
+    Walks the (user, created_at) index, so the ordering is fixed and does
+    not follow the photo ``?ordering=`` parameter.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
@@ -0,0 +1,59 @@
+"""
+Renderers for the photo API.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    Produces the same bytes as the compact, unicode JSONRenderer output
+    for payloads without floats (orjson formats those differently), so it
+    is only used by views whose schema has none. Indented output, e.g.
+    for the browsable API, goes through the stdlib encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            # Let DRF's encoder format these, e.g. datetimes with a trailing Z.
+            # Integer keys (e.g. ListField item errors) become strings like json's.
+            option=(
+                orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                | orjson.OPT_NON_STR_KEYS
+            ),
+        )
+        # Same JavaScript-safe escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """
+    Newline-delimited JSON, so clients can ask for the export's media type.
+
+    The export streams its own NDJSON body; this renders the responses that
+    go through DRF, such as errors, as a single line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        ret = super().render(data, accepted_media_type, renderer_context)
+        return ret + b'\n' if ret else ret
@@ -0,0 +1,258 @@
+"""
+Resized renditions of stored photos, made by generate_renditions.
+
+Every configured (format, width) pair is a rendition spec. A photo is
+pending until it has a PhotoRendition for each spec; originals narrower
+than a spec's width are stored at their own width instead of upscaled.
+
+Each photo's ``rendition_index`` lists every size it can be served at,
+from these renditions and the Pexels URLs, so responses pick a best fit
+without parsing URLs or querying renditions per row.
+"""
+import io
+import math
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Photo, PhotoRendition
+from .workers import chunk_result, record_error
+
+# Pillow save() arguments per rendition format
+SAVE_OPTIONS = {
+    PhotoRendition.Format.WEBP: {'format': 'WEBP', 'method': 4},
+    PhotoRendition.Format.JPEG: {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+EXTENSIONS = {
+    PhotoRendition.Format.WEBP: 'webp',
+    PhotoRendition.Format.JPEG: 'jpg',
+}
+
+# Pexels sizes that keep the photo's aspect ratio (portrait, landscape and
+# tiny are crops)
+PEXELS_SIZE_FIELDS = ('src_original', 'src_large2x', 'src_large', 'src_medium', 'src_small')
+
+# Format served when a width has renditions in several
+PREFERRED_FORMATS = (PhotoRendition.Format.WEBP, PhotoRendition.Format.JPEG)
+
+
+def pexels_width(url, width, height):
+    """
+    Pixel width Pexels serves ``url`` at, or None for cropped sizes.
+
+    Resized URLs fit the photo into their ``w``/``h`` box (never
+    upscaling) and multiply by ``dpr``; URLs without a query are the
+    original.
+    """
+    params = {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+    if params.get('fit') == 'crop':
+        return None
+    try:
+        scale = min(
+            1,
+            int(params['w']) / width if 'w' in params else 1,
+            int(params['h']) / height if 'h' in params else 1,
+        )
+        return round(width * scale * float(params.get('dpr', 1)))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def build_rendition_index(width, height, pexels_urls, stored):
+    """
+    Rendition index entries for one photo, narrowest first.
+
+    ``stored`` holds ``(format, width, name)`` for its renditions; at equal
+    widths a stored rendition wins over Pexels, and WebP over JPEG.
+    """
+    entries = {}
+    for url in pexels_urls:
+        served_width = pexels_width(url, width, height) if url else None
+        if served_width:
+            entries.setdefault(served_width, {'w': served_width, 'url': url})
+    rank = {image_format: index for index, image_format in enumerate(PREFERRED_FORMATS)}
+    for _, stored_width, name in sorted(stored, key=lambda item: rank.get(item[0], len(rank))):
+        entry = entries.get(stored_width)
+        if entry is None or 'url' in entry:
+            entries[stored_width] = {'w': stored_width, 'name': name}
+    return [entries[key] for key in sorted(entries)]
+
+
+def pexels_rendition_index(row):
+    """Rendition index for a photo that has no stored renditions yet."""
+    return build_rendition_index(
+        row['width'], row['height'], [row[field] for field in PEXELS_SIZE_FIELDS], []
+    )
+
+
+def refresh_rendition_index(queryset, touch=True):
+    """
+    Rebuild ``rendition_index`` for ``queryset``'s photos in three queries.
+
+    ``touch`` also sets ``updated_at``, so conditional GETs see the new sizes.
+    """
+    photos = list(queryset.only('id', 'width', 'height', *PEXELS_SIZE_FIELDS))
+    stored = defaultdict(set)
+    renditions = PhotoRendition.objects.filter(photo__in=[photo.pk for photo in photos])
+    for photo_id, image_format, width, name in renditions.values_list('photo_id', 'format', 'width', 'file'):
+        stored[photo_id].add((image_format, width, name))
+    now = timezone.now()
+    for photo in photos:
+        photo.rendition_index = build_rendition_index(
+            photo.width, photo.height,
+            [getattr(photo, field) for field in PEXELS_SIZE_FIELDS],
+            stored[photo.pk],
+        )
+        photo.updated_at = now
+    Photo.objects.bulk_update(photos, ['rendition_index', 'updated_at'] if touch else ['rendition_index'])
+
+
+def best_fit(index, width):
+    """Narrowest entry at least ``width`` pixels wide, else the widest; None if empty."""
+    if not index:
+        return None
+    if width is not None:
+        for entry in index:
+            if entry['w'] >= width:
+                return entry
+    return index[-1]
+
+
+def entry_url(entry, storage_url):
+    """URL of an index entry; ``storage_url`` maps a stored file name to its URL."""
+    return entry['url'] if 'url' in entry else storage_url(entry['name'])
+
+
+def rendition_data(index, width, storage_url):
+    """Serialized best fit for ``width`` device pixels, or None if ``index`` is empty."""
+    entry = best_fit(index, width)
+    if entry is None:
+        return None
+    return {'url': entry_url(entry, storage_url), 'width': entry['w']}
+
+
+def srcset(index, storage_url):
+    """``srcset`` attribute value listing every entry in ``index``."""
+    return ', '.join(f'{entry_url(entry, storage_url)} {entry["w"]}w' for entry in index)
+
+
+def requested_width(width, dpr=1):
+    """Device pixels needed to show an image ``width`` CSS pixels wide at ``dpr``."""
+    return math.ceil(width * dpr)
+
+
+def rendition_specs(widths=None, formats=None):
+    """``(format, width)`` pairs to generate, from settings by default."""
+    widths = widths or getattr(settings, 'PHOTO_RENDITION_WIDTHS', [320, 640, 1280])
+    formats = formats or getattr(settings, 'PHOTO_RENDITION_FORMATS', ['webp', 'jpeg'])
+    return [(image_format, width) for image_format in formats for width in sorted(set(widths))]
+
+
+def pending_photos(specs):
+    """Photos with a stored image that are missing at least one of ``specs``."""
+    formats = {image_format for image_format, _ in specs}
+    widths = {width for _, width in specs}
+    return Photo.objects.exclude(image='').exclude(image__isnull=True).annotate(
+        rendition_count=Count(
+            'renditions',
+            filter=Q(renditions__format__in=formats, renditions__target_width__in=widths),
+        )
+    ).filter(rendition_count__lt=len(specs))
+
+
+def render(data, specs, quality):
+    """
+    Encode ``data`` (an image file's bytes) at every spec.
+
+    Returns ``[(format, target_width, width, height, content), ...]``;
+    specs that come out the same size share one encoded file.
+    """
+    largest = max(width for _, width in specs)
+    with Image.open(io.BytesIO(data)) as original:
+        # Let JPEG decode straight to a reduced scale that still covers the largest spec
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+    if image.mode not in ('RGB', 'RGBA'):
+        # Palette and CMYK images resize poorly and encode inconsistently
+        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+    resized = {}
+    encoded = {}
+    outputs = []
+    for image_format, target_width in specs:
+        width = min(target_width, image.width)
+        if width not in resized:
+            height = max(1, round(image.height * width / image.width))
+            resized[width] = image if width == image.width else image.resize(
+                (width, height), Image.Resampling.LANCZOS
+            )
+        frame = resized[width]
+        if (image_format, width) not in encoded:
+            if image_format == PhotoRendition.Format.JPEG and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            buffer = io.BytesIO()
+            frame.save(buffer, quality=quality, **SAVE_OPTIONS[image_format])
+            encoded[image_format, width] = buffer.getvalue()
+        outputs.append((image_format, target_width, width, frame.height, encoded[image_format, width]))
+    return outputs
+
+
+def generate_for_photo(photo, specs, quality):
+    """Render, upload and record every spec for one photo; returns the rendition count."""
+    with photo.image.open('rb') as file:
+        data = file.read()
+
+    uploaded = {}
+    renditions = []
+    for image_format, target_width, width, height, content in render(data, specs, quality):
+        name = uploaded.get((image_format, width))
+        if name is None:
+            name = default_storage.save(
+                f'renditions/{photo.pk}/{width}w.{EXTENSIONS[image_format]}', ContentFile(content)
+            )
+            uploaded[image_format, width] = name
+        renditions.append(PhotoRendition(
+            photo=photo, format=image_format, target_width=target_width,
+            width=width, height=height, file=name, size=len(content),
+        ))
+    PhotoRendition.objects.bulk_create(
+        renditions,
+        update_conflicts=True,
+        unique_fields=['photo', 'format', 'target_width'],
+        update_fields=['width', 'height', 'file', 'size'],
+    )
+    return len(renditions)
+
+
+def generate_chunk(task):
+    """
+    Generate renditions for a chunk of photos.
+
+    ``task`` is ``(index, photo_ids, specs, quality)``. Runs in pool
+    workers, so failing photos are returned as counters and messages
+    instead of being raised.
+    """
+    index, photo_ids, specs, quality = task
+    result = chunk_result(index, 'photos', 'renditions', 'cpu_seconds')
+    started = time.process_time()
+    rendered = []
+    for photo in Photo.objects.filter(id__in=photo_ids).only('id', 'image'):
+        try:
+            result['renditions'] += generate_for_photo(photo, specs, quality)
+            result['photos'] += 1
+            rendered.append(photo.pk)
+        except Exception as e:
+            record_error(result, f'Photo {photo.pk}: {str(e)}')
+    if rendered:
+        # Failed photos are unchanged; leave their updated_at and ETag alone
+        refresh_rendition_index(Photo.objects.filter(id__in=rendered))
+    result['cpu_seconds'] = time.process_time() - started
+    return result
@@ -3,7 +3,14 @@ Serializers for the photo API.
 """
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Photo, PhotoFavorite
+from .models import Photo, PhotoFavorite, PhotoRendition
+from .renditions import rendition_data, srcset
+
+# Most photo IDs one bulk favorites request may change
+BULK_FAVORITES_MAX_IDS = 1000
+
+# Most photos one batch retrieve request may fetch
+BATCH_MAX_IDS = 100
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -29,11 +36,72 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class PhotoSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets.
+    
+    Pass ``fields`` to limit the output to those field names, and use
+    ``columns_for`` to load only the model columns they need.
+    """
+    
+    # Fields that are not backed by a model column of the same name
+    field_columns = {}
+    
+    # Fields left out unless named in ``fields``
+    optional_fields = ()
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        dropped = set(self.fields) - set(fields) if fields is not None else self.optional_fields
+        for name in dropped:
+            self.fields.pop(name)
+    
+    @classmethod
+    def columns_for(cls, fields):
+        """Model columns needed to serialize ``fields``."""
+        columns = {'id'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, (name,)))
+        return columns
+
+
+class RenditionFieldsMixin:
+    """
+    ``rendition`` and ``srcset`` fields read from ``Photo.rendition_index``.
+    
+    ``rendition`` is the best fit for the ``rendition_width`` in the
+    context (device pixels), or the largest size when there is none.
+    """
+    
+    def rendition_storage_url(self, name):
+        url = PhotoRendition._meta.get_field('file').storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_rendition(self, obj):
+        """Smallest rendition at least the requested width, or the largest."""
+        return rendition_data(
+            obj.rendition_index, self.context.get('rendition_width'), self.rendition_storage_url
+        )
+    
+    def get_srcset(self, obj) -> str:
+        """Every rendition as an HTML ``srcset`` attribute value."""
+        return srcset(obj.rendition_index, self.rendition_storage_url)
+
+
+class PhotoSerializer(SparseFieldsMixin, RenditionFieldsMixin, serializers.ModelSerializer):
     """Serializer for photo model."""
     
+    field_columns = {
+        'image_url': ('image',), 'is_favorited': (),
+        'rendition': ('rendition_index',), 'srcset': ('rendition_index',),
+    }
+    optional_fields = ('rendition', 'srcset')
+    
     is_favorited = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    rendition = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Photo
@@ -43,9 +111,9 @@ class PhotoSerializer(serializers.ModelSerializer):
             'avg_color', 'alt', 'image', 'image_url',
             'src_original', 'src_large2x', 'src_large', 'src_medium',
             'src_small', 'src_portrait', 'src_landscape', 'src_tiny',
-            'created_at', 'updated_at', 'is_favorited'
+            'favorite_count', 'created_at', 'updated_at', 'is_favorited', 'rendition', 'srcset'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at', 'image_url')
+        read_only_fields = ('id', 'favorite_count', 'created_at', 'updated_at', 'image_url')
     
     def get_image_url(self, obj):
         """Get the full URL for the stored image."""
@@ -58,6 +126,10 @@ class PhotoSerializer(serializers.ModelSerializer):
     
     def get_is_favorited(self, obj) -> bool:
         """Check if the current user has favorited this photo."""
+        # Prefer the flag annotated by PhotoQuerySet.with_favorited()
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return PhotoFavorite.objects.filter(
@@ -67,11 +139,19 @@ class PhotoSerializer(serializers.ModelSerializer):
         return False
 
 
-class PhotoListSerializer(serializers.ModelSerializer):
+class PhotoListSerializer(SparseFieldsMixin, RenditionFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for photo list views."""
     
+    field_columns = {
+        'image_url': ('image',), 'is_favorited': (),
+        'rendition': ('rendition_index',), 'srcset': ('rendition_index',),
+    }
+    optional_fields = ('rendition', 'srcset')
+    
     is_favorited = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    rendition = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Photo
@@ -80,9 +160,9 @@ class PhotoListSerializer(serializers.ModelSerializer):
             'photographer', 'photographer_url', 'photographer_id',
             'avg_color', 'alt', 'image_url',
             'src_medium', 'src_small', 'src_tiny',
-            'created_at', 'is_favorited'
+            'favorite_count', 'created_at', 'is_favorited', 'rendition', 'srcset'
         )
-        read_only_fields = ('id', 'created_at', 'image_url')
+        read_only_fields = ('id', 'favorite_count', 'created_at', 'image_url')
     
     def get_image_url(self, obj):
         """Get the full URL for the stored image."""
@@ -95,6 +175,10 @@ class PhotoListSerializer(serializers.ModelSerializer):
     
     def get_is_favorited(self, obj) -> bool:
         """Check if the current user has favorited this photo."""
+        # Prefer the flag annotated by PhotoQuerySet.with_favorited()
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return PhotoFavorite.objects.filter(
@@ -102,3 +186,30 @@ class PhotoListSerializer(serializers.ModelSerializer):
                 photo=obj
             ).exists()
         return False
+
+
+class BulkFavoriteSerializer(serializers.Serializer):
+    """Photo IDs to add to or remove from favorites in one request."""
+    
+    photo_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_FAVORITES_MAX_IDS,
+    )
+    
+    def validate_photo_ids(self, value):
+        # Keep the first occurrence of each ID, in request order
+        return list(dict.fromkeys(value))
+
+
+class PhotoBatchSerializer(serializers.Serializer):
+    """Photo IDs to fetch in one request."""
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_MAX_IDS,
+    )
+    
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
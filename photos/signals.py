@@ -0,0 +1,50 @@
+"""
+Signal handlers for the photos app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .conditional import bump_favorites_version
+from .models import Photo, PhotoFavorite
+from .renditions import PEXELS_SIZE_FIELDS, refresh_rendition_index
+
+SEARCH_VECTOR_SOURCE_FIELDS = {'photographer', 'alt'}
+
+RENDITION_INDEX_SOURCE_FIELDS = {'width', 'height', *PEXELS_SIZE_FIELDS}
+
+
+@receiver(post_save, sender=Photo)
+def update_photo_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Keep ``search_vector`` in sync with photographer and alt text."""
+    if update_fields is not None and not SEARCH_VECTOR_SOURCE_FIELDS & set(update_fields):
+        return
+    if not instance.has_changed(SEARCH_VECTOR_SOURCE_FIELDS):
+        return
+    Photo.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Photo)
+def update_photo_rendition_index(sender, instance, update_fields=None, **kwargs):
+    """Keep ``rendition_index`` in sync with the photo's size and Pexels URLs."""
+    if update_fields is not None and not RENDITION_INDEX_SOURCE_FIELDS & set(update_fields):
+        return
+    if not instance.has_changed(RENDITION_INDEX_SOURCE_FIELDS):
+        return
+    refresh_rendition_index(Photo.objects.filter(pk=instance.pk), touch=False)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Drop cached photo responses once a photo change commits."""
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=PhotoFavorite)
+@receiver(post_delete, sender=PhotoFavorite)
+def invalidate_favorites_version(sender, instance, **kwargs):
+    """Change the validators of the user's favorites pages."""
+    bump_favorites_version(instance.user_id)
+
@@ -0,0 +1,547 @@
+"""
+Tests for photo management commands.
+"""
+import asyncio
+import csv
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from photos.download_engine import AIMDLimiter, DownloadEngine
+from photos.ingestion import Checkpoint, plan_chunks
+from photos.models import Photo, PhotoDownload, PhotoFavorite, PhotoRendition
+
+CSV_HEADER = [
+    'id', 'width', 'height', 'url', 'photographer', 'photographer_url',
+    'photographer_id', 'avg_color', 'src.original', 'src.large2x', 'src.large',
+    'src.medium', 'src.small', 'src.portrait', 'src.landscape', 'src.tiny', 'alt',
+]
+
+
+def csv_row(pexels_id, **kwargs):
+    row = {
+        'id': pexels_id,
+        'width': 1920,
+        'height': 1080,
+        'url': f'https://example.com/photo/{pexels_id}',
+        'photographer': 'Test Photographer',
+        'photographer_url': 'https://example.com/photographer',
+        'photographer_id': 1,
+        'avg_color': '#FFFFFF',
+        'src.original': f'https://example.com/{pexels_id}/original.jpg',
+        'src.large2x': f'https://example.com/{pexels_id}/large2x.jpg',
+        'src.large': f'https://example.com/{pexels_id}/large.jpg',
+        'src.medium': f'https://example.com/{pexels_id}/medium.jpg',
+        'src.small': f'https://example.com/{pexels_id}/small.jpg',
+        'src.portrait': f'https://example.com/{pexels_id}/portrait.jpg',
+        'src.landscape': f'https://example.com/{pexels_id}/landscape.jpg',
+        'src.tiny': f'https://example.com/{pexels_id}/tiny.jpg',
+        'alt': f'Photo {pexels_id}',
+    }
+    row.update(kwargs)
+    return row
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def image_server():
+    """Local HTTP server standing in for images.pexels.com; serves /<pexels_id>.jpg."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.lstrip('/').split('?')[0]
+            if not name.endswith('.jpg') or name.startswith('missing'):
+                self.send_error(404)
+                return
+            body = image_bytes(name)
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_storage(settings, tmp_path):
+    """Swap S3/MinIO for a FileSystemStorage rooted in a temporary directory."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.STORAGES = {
+        **settings.STORAGES,
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    }
+    return tmp_path / 'media'
+
+
+def image_bytes(name):
+    return name.encode() * 5000
+
+
+def create_photo(pexels_id, **kwargs):
+    data = {
+        'pexels_id': pexels_id,
+        'width': 1920,
+        'height': 1080,
+        'url': f'https://example.com/photo/{pexels_id}',
+        'photographer': 'Test Photographer',
+        'photographer_url': 'https://example.com/photographer',
+        'photographer_id': 1,
+        'avg_color': '#FFFFFF',
+    }
+    for size in ('original', 'large2x', 'large', 'medium', 'small', 'portrait', 'landscape', 'tiny'):
+        data[f'src_{size}'] = f'https://example.com/{pexels_id}/{size}.jpg'
+    data.update(kwargs)
+    return Photo.objects.create(**data)
+
+
+def ingest(*args):
+    out = StringIO()
+    call_command('ingest_photos', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class TestIngestPhotosBulk:
+    """Test the bulk upsert mode of ingest_photos."""
+
+    def test_bulk_creates_photos(self, tmp_path):
+        """Test that bulk mode creates every valid row across batches."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(i) for i in range(1, 6)])
+
+        output = ingest(path, '--bulk', '--batch-size', '2')
+
+        assert 'Created: 5' in output
+        assert Photo.objects.count() == 5
+        assert Photo.objects.filter(search_vector__isnull=True).count() == 0
+        assert not Photo.objects.filter(rendition_index=[]).exists()
+
+    def test_bulk_skips_existing_without_update(self, tmp_path):
+        """Test that existing photos are counted as skipped and left untouched."""
+        ingest(write_csv(tmp_path / 'first.csv', [csv_row(1)]), '--bulk')
+        path = write_csv(tmp_path / 'second.csv', [csv_row(1, alt='Changed'), csv_row(2)])
+
+        output = ingest(path, '--bulk')
+
+        assert 'Created: 1' in output
+        assert 'Skipped: 1' in output
+        assert Photo.objects.get(pexels_id=1).alt == 'Photo 1'
+
+    def test_bulk_updates_existing(self, tmp_path):
+        """Test that --update rewrites existing photos."""
+        ingest(write_csv(tmp_path / 'first.csv', [csv_row(1)]), '--bulk')
+        resized = csv_row(1, alt='Changed', **{'src.large': 'https://example.com/1/large.jpg?h=650&w=940'})
+        path = write_csv(tmp_path / 'second.csv', [resized, csv_row(2)])
+
+        output = ingest(path, '--bulk', '--update')
+
+        assert 'Created: 1' in output
+        assert 'Updated: 1' in output
+        photo = Photo.objects.get(pexels_id=1)
+        assert photo.alt == 'Changed'
+        assert [entry['w'] for entry in photo.rendition_index] == [940, 1920]
+
+    def test_rejects_non_positive_batch_size(self, tmp_path):
+        """Test that a batch size below one is rejected before reading the file."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(1)])
+
+        for batch_size in ('0', '-5'):
+            with pytest.raises(CommandError):
+                ingest(path, '--bulk', '--batch-size', batch_size)
+        assert not Photo.objects.exists()
+
+    def test_bulk_reports_errors(self, tmp_path):
+        """Test that malformed rows are reported and do not stop the batch."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(1), csv_row('abc'), csv_row(3)])
+
+        output = ingest(path, '--bulk')
+
+        assert 'Created: 2' in output
+        assert 'Errors: 1' in output
+        assert 'Row 3' in output
+
+
+@pytest.mark.django_db
+class TestIngestPhotosPipeline:
+    """Test the chunked, resumable ingestion pipeline."""
+
+    def test_chunks_cover_every_row(self, tmp_path):
+        """Test that chunk boundaries split the file on whole lines."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(i) for i in range(1, 8)])
+
+        header, chunks = plan_chunks(path, 600)
+
+        assert header == CSV_HEADER
+        assert len(chunks) > 1
+        assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+        with open(path, 'rb') as file:
+            data = file.read()
+        assert all(data[end - 1:end] == b'\n' for _, end in chunks)
+
+    def test_pipeline_ingests_all_chunks(self, tmp_path):
+        """Test that every chunk is committed and the checkpoint is cleaned up."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(i) for i in range(1, 11)])
+
+        output = ingest(path, '--workers', '1', '--chunk-size', '600')
+
+        assert 'Created: 10' in output
+        assert 'rows/sec' in output
+        assert Photo.objects.count() == 10
+        assert not (tmp_path / 'photos.csv.checkpoint').exists()
+
+    def test_pipeline_numbers_chunks_from_one(self, tmp_path):
+        """Test that row errors name the chunk the same way progress does."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(1), csv_row('abc'), csv_row(3)])
+
+        output = ingest(path, '--workers', '1')
+
+        assert 'Chunk 1/1 committed' in output
+        assert 'Chunk 1 line 2:' in output
+
+    def test_pipeline_resumes_from_checkpoint(self, tmp_path):
+        """Test that chunks recorded in the checkpoint are not ingested again."""
+        path = write_csv(tmp_path / 'photos.csv', [csv_row(i) for i in range(1, 11)])
+        _, chunks = plan_chunks(path, 600)
+        checkpoint = Checkpoint(f'{path}.checkpoint', path, 600)
+        checkpoint.mark_done(0)
+
+        output = ingest(path, '--workers', '1', '--chunk-size', '600')
+
+        assert f'1/{len(chunks)} chunks already committed' in output
+        assert not Photo.objects.filter(pexels_id=1).exists()
+        assert Photo.objects.filter(pexels_id=10).exists()
+
+    def test_pipeline_keeps_checkpoint_on_failure(self, tmp_path):
+        """Test that a failed chunk leaves a checkpoint of the committed ones."""
+        rows = [csv_row(i) for i in range(1, 11)]
+        rows[-1]['avg_color'] = '#' + 'F' * 20  # Too long for the column
+        path = write_csv(tmp_path / 'photos.csv', rows)
+
+        with pytest.raises(CommandError):
+            ingest(path, '--workers', '1', '--chunk-size', '600')
+
+        checkpoint = Checkpoint(f'{path}.checkpoint', path, 600)
+        assert checkpoint.load()
+        assert Photo.objects.filter(pexels_id=1).exists()
+        assert not Photo.objects.filter(pexels_id=10).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pipeline_with_worker_processes(tmp_path):
+    """Test that worker processes commit their chunks independently."""
+    path = write_csv(tmp_path / 'photos.csv', [csv_row(i) for i in range(1, 21)])
+
+    output = ingest(path, '--workers', '2', '--chunk-size', '600')
+
+    assert 'Created: 20' in output
+    assert Photo.objects.count() == 20
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDownloadPhotos:
+    """Test download_photos against a local image server."""
+
+    def test_streams_images_into_storage(self, image_server, local_storage):
+        """Test that downloaded bytes land in storage unchanged."""
+        photo = create_photo(1, src_medium=f'{image_server}/1.jpg')
+        out = StringIO()
+
+        call_command('download_photos', '--size', 'medium', stdout=out)
+
+        photo.refresh_from_db()
+        assert 'Downloaded: 1' in out.getvalue()
+        assert photo.image.name == 'photos/1_medium.jpg'
+        assert (local_storage / photo.image.name).read_bytes() == image_bytes('1.jpg')
+
+    def test_reports_failed_downloads(self, image_server, local_storage):
+        """Test that HTTP errors are counted as failures."""
+        photo = create_photo(1, src_medium=f'{image_server}/missing.jpg')
+        out = StringIO()
+
+        call_command('download_photos', '--size', 'medium', stdout=out)
+
+        photo.refresh_from_db()
+        assert 'Failed: 1' in out.getvalue()
+        assert not photo.image
+
+    def test_async_engine(self, image_server, local_storage):
+        """Test that the async engine downloads every pending photo."""
+        photos = [create_photo(i, src_medium=f'{image_server}/{i}.jpg') for i in range(1, 13)]
+        out = StringIO()
+
+        call_command('download_photos', '--size', 'medium', '--engine', 'async', stdout=out)
+
+        assert 'Downloaded: 12' in out.getvalue()
+        for photo in photos:
+            photo.refresh_from_db()
+            assert (local_storage / photo.image.name).read_bytes() == image_bytes(f'{photo.pexels_id}.jpg')
+
+    def test_rejects_non_positive_latency_target(self):
+        """Test that --latency-target must be positive."""
+        with pytest.raises(CommandError, match='--latency-target'):
+            call_command('download_photos', '--engine', 'async', '--latency-target', '0')
+
+    def test_manifest_records_attempts(self, image_server, local_storage):
+        """Test that photos failing max attempts are skipped until retried."""
+        photo = create_photo(1, src_medium=f'{image_server}/missing.jpg')
+        args = ('download_photos', '--size', 'medium', '--max-attempts', '2')
+
+        call_command(*args, stdout=StringIO())
+        download = PhotoDownload.objects.get(photo=photo)
+        assert download.status == PhotoDownload.Status.PENDING
+        assert download.attempts == 1
+        assert '404' in download.last_error
+
+        call_command(*args, stdout=StringIO())
+        download.refresh_from_db()
+        assert download.status == PhotoDownload.Status.FAILED
+        assert download.attempts == 2
+
+        out = StringIO()
+        call_command(*args, stdout=out)
+        assert 'Downloading 0 photos' in out.getvalue()
+
+        Photo.objects.filter(pk=photo.pk).update(src_medium=f'{image_server}/1.jpg')
+        call_command(*args, '--retry-failed', stdout=StringIO())
+        download.refresh_from_db()
+        assert download.status == PhotoDownload.Status.DONE
+
+    def test_reconcile_attaches_orphaned_uploads(self, image_server, local_storage):
+        """Test that images already in storage are linked without downloading."""
+        orphan = create_photo(1, src_medium=f'{image_server}/missing.jpg')
+        other_size = create_photo(2, src_medium=f'{image_server}/missing.jpg')
+        (local_storage / 'photos').mkdir(parents=True)
+        (local_storage / 'photos' / '1_medium_AbC1234.jpg').write_bytes(b'orphan')
+        (local_storage / 'photos' / '2_large.jpg').write_bytes(b'orphan')
+        updated_at = orphan.updated_at
+        out = StringIO()
+
+        call_command('download_photos', '--size', 'medium', '--reconcile', stdout=out)
+
+        orphan.refresh_from_db()
+        other_size.refresh_from_db()
+        assert 'Reconciled 1 photos' in out.getvalue()
+        assert orphan.image.name == 'photos/1_medium_AbC1234.jpg'
+        assert orphan.download.status == PhotoDownload.Status.DONE
+        assert orphan.updated_at > updated_at
+        assert not other_size.image
+
+
+class TestDownloadEngine:
+    """Test the async download engine scheduling."""
+
+    def test_per_host_cap(self):
+        """Test that no host sees more concurrent jobs than allowed."""
+        lock = threading.Lock()
+        active = {}
+        peak = {}
+
+        def handler(item):
+            host = item.split('/')[2]
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.01)
+            with lock:
+                active[host] -= 1
+            return True, None, None
+
+        items = [f'http://host{i % 2}.test/{i}.jpg' for i in range(40)]
+        results = []
+        engine = DownloadEngine(
+            handler, lambda item: item,
+            initial_concurrency=16, max_concurrency=16, per_host=3, queue_size=4,
+        )
+
+        engine.run(items, lambda item, success, error: results.append(success))
+
+        assert len(results) == 40 and all(results)
+        assert max(peak.values()) <= 3
+
+    def test_handler_errors_are_failures(self):
+        """Test that exceptions raised by the handler are reported as failures."""
+        def handler(item):
+            raise RuntimeError('boom')
+
+        results = []
+        engine = DownloadEngine(handler, lambda item: item, max_concurrency=2)
+
+        engine.run(['http://host.test/1.jpg'], lambda item, success, error: results.append((success, error)))
+
+        assert results == [(False, 'boom')]
+
+    def test_reported_latency_drives_limiter(self):
+        """Test that the limiter judges the latency the handler reports, not the call time."""
+        def handler(item):
+            time.sleep(0.2)  # e.g. a slow upload after a fast response
+            return True, None, 0.01
+
+        engine = DownloadEngine(
+            handler, lambda item: item,
+            initial_concurrency=4, max_concurrency=8, latency_target=0.1,
+        )
+
+        engine.run(['http://host.test/1.jpg'], lambda item, success, error: None)
+
+        assert engine.limiter.limit == pytest.approx(4.25)
+
+    def test_aimd_limiter(self):
+        """Test additive increase on fast successes and multiplicative decrease on errors."""
+        async def scenario():
+            limiter = AIMDLimiter(initial=4, maximum=8, latency_target=1.0)
+            for _ in range(8):
+                await limiter.acquire()
+                await limiter.release(0.01, True)
+            grown = limiter.limit
+            await limiter.acquire()
+            await limiter.release(0.01, False)
+            await limiter.acquire()
+            await limiter.release(0.01, False)
+            return grown, limiter.limit
+
+        grown, shrunk = asyncio.run(scenario())
+
+        assert 5 < grown <= 8
+        assert shrunk == pytest.approx(grown / 2)
+
+
+@pytest.mark.django_db
+def test_prune_tokens(django_user_model):
+    """Test that expired tokens and their blacklist entries are deleted in batches."""
+    user = django_user_model.objects.create_user(username='pruned', password='testpass123')
+    now = timezone.now()
+    for index in range(5):
+        expires_at = now + timedelta(days=1 if index == 0 else -1)
+        token = OutstandingToken.objects.create(
+            user=user, jti=f'jti-{index}', token='token', expires_at=expires_at
+        )
+        BlacklistedToken.objects.create(token=token)
+
+    out = StringIO()
+    call_command('prune_tokens', '--batch-size', '2', stdout=out)
+
+    assert 'Pruned 4 expired tokens' in out.getvalue()
+    assert list(OutstandingToken.objects.values_list('jti', flat=True)) == ['jti-0']
+    assert BlacklistedToken.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_favorite_counts(django_user_model):
+    """Test that drifted favorite counts are recounted in batches."""
+    user = django_user_model.objects.create_user(username='counter', password='testpass123')
+    photos = [create_photo(pexels_id) for pexels_id in range(1, 4)]
+    for photo in photos[:2]:
+        PhotoFavorite.objects.create(user=user, photo=photo)
+    Photo.objects.filter(pk=photos[0].pk).update(favorite_count=1)
+    Photo.objects.filter(pk=photos[2].pk).update(favorite_count=7)
+
+    out = StringIO()
+    call_command('reconcile_favorite_counts', '--batch-size', '2', stdout=out)
+
+    assert 'Checked 3 photos, fixed 2 favorite counts' in out.getvalue()
+    counts = dict(Photo.objects.values_list('pk', 'favorite_count'))
+    assert [counts[photo.pk] for photo in photos] == [1, 1, 0]
+
+
+def stored_photo(pexels_id, size, image_format='JPEG'):
+    """Photo whose stored image is a generated ``size`` picture."""
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, image_format)
+    photo = create_photo(pexels_id)
+    photo.image.save(f'{pexels_id}.jpg', ContentFile(buffer.getvalue()))
+    return photo
+
+
+def generate_renditions(*args):
+    out = StringIO()
+    call_command('generate_renditions', '--widths', '320,640', '--formats', 'webp,jpeg', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class TestGenerateRenditions:
+    """Test the rendition pipeline."""
+
+    def test_generates_every_spec(self, local_storage):
+        """Test that each format/width is stored and recorded, without upscaling."""
+        large = stored_photo(1, (1000, 600))
+        small = stored_photo(2, (400, 300), 'PNG')
+
+        output = generate_renditions('--workers', '1')
+
+        assert 'Photos: 2' in output and 'Renditions: 8' in output
+        assert 'images/sec per core' in output
+        renditions = {
+            (rendition.photo_id, rendition.format, rendition.target_width): rendition
+            for rendition in PhotoRendition.objects.all()
+        }
+        assert len(renditions) == 8
+        webp = renditions[large.id, 'webp', 320]
+        assert (webp.width, webp.height) == (320, 192)
+        with Image.open(local_storage / webp.file.name) as image:
+            assert image.format == 'WEBP' and image.size == (320, 192)
+        # The 400px original is stored once at its own width for the 640 spec
+        assert renditions[small.id, 'jpeg', 640].width == 400
+        assert renditions[small.id, 'webp', 640].file.name != renditions[small.id, 'webp', 320].file.name
+        # WebP files are indexed ahead of the Pexels original
+        large.refresh_from_db()
+        assert large.rendition_index == [
+            {'w': 320, 'name': renditions[large.id, 'webp', 320].file.name},
+            {'w': 640, 'name': renditions[large.id, 'webp', 640].file.name},
+            {'w': 1920, 'url': large.src_original},
+        ]
+
+    def test_incremental(self, local_storage):
+        """Test that a rerun only processes photos missing a rendition."""
+        stored_photo(1, (800, 600))
+        generate_renditions('--workers', '1')
+        stored_photo(2, (800, 600))
+
+        assert 'Photos: 1' in generate_renditions('--workers', '1')
+        assert 'Photos: 0' in generate_renditions('--workers', '1')
+
+    def test_reports_unreadable_images(self, local_storage):
+        """Test that a broken image is counted and the rest still processed."""
+        stored_photo(1, (800, 600))
+        broken = create_photo(2)
+        broken.image.save('2.jpg', ContentFile(b'not an image'))
+        updated_at = Photo.objects.get(pk=broken.pk).updated_at
+
+        output = generate_renditions('--workers', '1')
+
+        assert 'Photos: 1' in output and 'Errors: 1' in output
+        assert f'Photo {broken.id}:' in output
+        assert Photo.objects.get(pk=broken.pk).updated_at == updated_at
+
+
+@pytest.mark.django_db(transaction=True)
+def test_renditions_with_worker_processes(local_storage):
+    """Test the process pool path end to end."""
+    for pexels_id in range(1, 5):
+        stored_photo(pexels_id, (700, 500))
+
+    output = generate_renditions('--workers', '2', '--chunk-size', '1')
+
+    assert 'Photos: 4' in output
+    assert PhotoRendition.objects.count() == 16
@@ -0,0 +1,50 @@
+"""
+Tests for the pooled PostgreSQL backend.
+"""
+import pytest
+from django.db import connection, connections
+from photo_api.db.backends.postgresql_pool.base import DatabaseWrapper, close_pools
+
+
+def backend_pid(wrapper):
+    with wrapper.cursor() as cursor:
+        cursor.execute('SELECT pg_backend_pid()')
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def pooled():
+    settings_dict = {
+        **connection.settings_dict,
+        'ENGINE': 'photo_api.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {'min_size': 1, 'max_size': 1},
+    }
+    wrapper = DatabaseWrapper(settings_dict, alias='pool-test')
+    # Connection signal handlers look the alias up
+    connections['pool-test'] = wrapper
+    yield wrapper
+    wrapper.close()
+    del connections['pool-test']
+    close_pools()
+
+
+@pytest.mark.django_db
+class TestPooledBackend:
+    """Test connection reuse through the psycopg pool."""
+
+    def test_close_returns_connection_to_pool(self, pooled):
+        """Test that a closed Django connection is reused, not reopened."""
+        first = backend_pid(pooled)
+        pooled.close()
+
+        assert backend_pid(pooled) == first
+
+    def test_dead_connections_are_replaced(self, pooled):
+        """Test that the checkout health check discards terminated connections."""
+        first = backend_pid(pooled)
+        pooled.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [first])
+
+        assert backend_pid(pooled) != first
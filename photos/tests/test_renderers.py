@@ -0,0 +1,41 @@
+"""
+Tests for photo API renderers.
+"""
+import datetime
+import decimal
+
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from photos.renderers import FastJSONRenderer
+
+
+class TestFastJSONRenderer:
+    """Test that FastJSONRenderer matches JSONRenderer byte for byte."""
+
+    DATA = {
+        'text': 'caf\u00e9 \u2028 \u2029 \U0001F332 "quoted" \\ \x00\x1f\x7f\n\t',
+        'none': None,
+        'flags': [True, False],
+        'numbers': [0, -1, 2 ** 62],
+        'nested': {'list': [{'a': 1}, []], 'empty': {}},
+        'item_errors': {0: ['Not a valid integer.'], 3: ['Too small.']},
+        'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2024, 1, 2),
+        'amount': decimal.Decimal('1.50'),
+        'lazy': gettext_lazy('Not found.'),
+        'error': ErrorDetail('Invalid.', code='invalid'),
+    }
+
+    def test_compact_output(self):
+        assert FastJSONRenderer().render(self.DATA) == JSONRenderer().render(self.DATA)
+
+    def test_indented_output(self):
+        media_type = 'application/json; indent=4'
+        assert (
+            FastJSONRenderer().render(self.DATA, media_type)
+            == JSONRenderer().render(self.DATA, media_type)
+        )
+
+    def test_empty_body(self):
+        assert FastJSONRenderer().render(None) == b''
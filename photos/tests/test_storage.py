@@ -0,0 +1,112 @@
+"""
+Tests for photo storage backends.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import botocore.auth
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from storages.backends.s3boto3 import S3Boto3Storage
+from photos import storage as storage_module
+from photos.storage import CachedSignedURLS3Storage, SignedURLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Control the time seen by the signed URL cache."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(storage_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def s3_storage(settings):
+    settings.AWS_QUERYSTRING_EXPIRE = 3600
+    settings.AWS_S3_URL_CACHE_WINDOW = 600
+    settings.AWS_S3_URL_CACHE_SIZE = 3
+    return CachedSignedURLS3Storage()
+
+
+class TestCachedSignedURLS3Storage:
+    """Test presigned URL caching."""
+
+    def test_same_url_within_window(self, s3_storage, clock):
+        """Test that repeat calls in a window return the identical URL."""
+        first = s3_storage.url('photos/1_medium.jpg')
+        clock[0] += 1
+        assert s3_storage.url('photos/1_medium.jpg') == first
+        assert 'X-Amz-Signature' in first
+
+    def test_same_url_across_processes(self, s3_storage, clock):
+        """Test that separate storages sign a window's URL identically, dated at its start."""
+        first = s3_storage.url('photos/1_medium.jpg')
+        clock[0] += 199
+        other = CachedSignedURLS3Storage()
+
+        assert other.url('photos/1_medium.jpg') == first
+        # 1_000_000 s rounded down to the 600 s window is 1970-01-12T13:40:00Z
+        assert 'X-Amz-Date=19700112T134000Z' in first
+        assert 'X-Amz-Expires=3600' in first
+
+    def test_matches_botocore_presigned_url(self, s3_storage, clock, monkeypatch):
+        """Test that a windowed URL is the one botocore presigns at the window start."""
+        class WindowStart(datetime):
+            @classmethod
+            def utcnow(cls):
+                return datetime(1970, 1, 12, 13, 40)
+
+        monkeypatch.setattr(botocore.auth, 'datetime', SimpleNamespace(datetime=WindowStart))
+        expected = S3Boto3Storage().url('photos/1_medium.jpg')
+
+        assert 'X-Amz-Date=19700112T134000Z' in expected
+        assert s3_storage.url('photos/1_medium.jpg') == expected
+        assert botocore.auth.AUTH_TYPE_MAPS.get('s3v4-windowed-query') is None
+
+    def test_new_url_in_next_window(self, s3_storage, clock, monkeypatch):
+        """Test that URLs are re-signed once the window rolls over."""
+        s3_storage.url('photos/1_medium.jpg')
+        clock[0] += 600
+        calls = []
+        original = s3_storage.bucket.meta.client.generate_presigned_url
+        monkeypatch.setattr(
+            s3_storage.bucket.meta.client, 'generate_presigned_url',
+            lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs),
+        )
+        s3_storage.url('photos/1_medium.jpg')
+        assert len(calls) == 1
+
+    def test_explicit_arguments_bypass_cache(self, s3_storage, clock):
+        """Test that custom parameters or expiry are never served from the cache."""
+        s3_storage.url('photos/1_medium.jpg')
+        url = s3_storage.url('photos/1_medium.jpg', expire=60)
+        assert 'X-Amz-Expires=60' in url
+        assert len(s3_storage.url_cache) == 1
+
+    def test_cache_is_bounded(self, s3_storage, clock):
+        """Test that the cache never holds more than its configured size."""
+        for pexels_id in range(10):
+            s3_storage.url(f'photos/{pexels_id}_medium.jpg')
+        assert len(s3_storage.url_cache) == 3
+
+    def test_window_must_be_shorter_than_expiry(self, settings):
+        """Test that a window that would hand out expired URLs is rejected."""
+        settings.AWS_QUERYSTRING_EXPIRE = 600
+        settings.AWS_S3_URL_CACHE_WINDOW = 600
+        with pytest.raises(ImproperlyConfigured):
+            CachedSignedURLS3Storage()
+
+
+class TestSignedURLCache:
+    """Test the LRU used for signed URLs."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that reads refresh recency."""
+        cache = SignedURLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
@@ -1,11 +1,23 @@
 """
 Tests for photo API views.
 """
+import gzip
+import json
+
 import pytest
 from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
-from photos.models import Photo, PhotoFavorite
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from photo_api.blacklist import BloomFilter, bump_blacklist_version, get_blacklist_version, revoked_tokens
+from photo_api.routers import PrimaryReplicaRouter, replica_reads
+from photos.cache import get_catalog_version
+from photos.models import Photo, PhotoFavorite, PhotoRendition
+from photos.renditions import best_fit, pexels_width, refresh_rendition_index
+from photos.serializers import PhotoListSerializer
 
 
 @pytest.fixture
@@ -28,27 +40,40 @@ def authenticated_client(api_client, user):
     return api_client
 
 
+def create_photo(pexels_id=12345, **kwargs):
+    data = {
+        'pexels_id': pexels_id,
+        'width': 1920,
+        'height': 1080,
+        'url': 'https://example.com/photo',
+        'photographer': 'Test Photographer',
+        'photographer_url': 'https://example.com/photographer',
+        'photographer_id': 1,
+        'avg_color': '#FFFFFF',
+        'alt': 'Test photo',
+        'src_original': 'https://example.com/original.jpg',
+        'src_large2x': 'https://example.com/large2x.jpg',
+        'src_large': 'https://example.com/large.jpg',
+        'src_medium': 'https://example.com/medium.jpg',
+        'src_small': 'https://example.com/small.jpg',
+        'src_portrait': 'https://example.com/portrait.jpg',
+        'src_landscape': 'https://example.com/landscape.jpg',
+        'src_tiny': 'https://example.com/tiny.jpg',
+    }
+    data.update(kwargs)
+    return Photo.objects.create(**data)
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    return len(context.captured_queries)
+
+
 @pytest.fixture
 def photo():
-    return Photo.objects.create(
-        pexels_id=12345,
-        width=1920,
-        height=1080,
-        url='https://example.com/photo',
-        photographer='Test Photographer',
-        photographer_url='https://example.com/photographer',
-        photographer_id=1,
-        avg_color='#FFFFFF',
-        alt='Test photo',
-        src_original='https://example.com/original.jpg',
-        src_large2x='https://example.com/large2x.jpg',
-        src_large='https://example.com/large.jpg',
-        src_medium='https://example.com/medium.jpg',
-        src_small='https://example.com/small.jpg',
-        src_portrait='https://example.com/portrait.jpg',
-        src_landscape='https://example.com/landscape.jpg',
-        src_tiny='https://example.com/tiny.jpg',
-    )
+    return create_photo()
 
 
 @pytest.mark.django_db
@@ -101,6 +126,160 @@ class TestAuthentication:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+def user_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    return [query for query in context.captured_queries if 'auth_user' in query['sql']]
+
+
+@pytest.fixture
+def token_client(api_client, user):
+    token = RefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return api_client
+
+
+@pytest.mark.django_db
+class TestCachedAuthentication:
+    """Test JWT user resolution through the cache."""
+
+    def test_user_is_cached(self, token_client, photo):
+        """Test that only the first request loads the user."""
+        assert len(user_queries(token_client, '/api/photos/')) == 1
+        assert user_queries(token_client, '/api/photos/') == []
+
+    def test_save_invalidates(self, token_client, user, photo, django_capture_on_commit_callbacks):
+        """Test that saving the user is seen by the next request after commit."""
+        user_queries(token_client, '/api/photos/')
+        user.is_active = False
+        with django_capture_on_commit_callbacks(execute=True):
+            user.save()
+
+        response = token_client.get('/api/photos/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deleted_user_is_rejected(
+        self, token_client, user, photo, django_capture_on_commit_callbacks
+    ):
+        """Test that deleting the user is seen by the next request after commit."""
+        user_queries(token_client, '/api/photos/')
+        with django_capture_on_commit_callbacks(execute=True):
+            user.delete()
+
+        response = token_client.get('/api/photos/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_last_login_is_throttled(self, api_client, user):
+        """Test that repeated logins write last_login once per interval."""
+        credentials = {'username': 'testuser', 'password': 'testpass123'}
+        response = api_client.post('/api/auth/token/', credentials)
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        first_login = user.last_login
+        assert first_login is not None
+
+        api_client.post('/api/auth/token/', credentials)
+        user.refresh_from_db()
+        assert user.last_login == first_login
+
+
+@pytest.mark.django_db
+class TestTokenBlacklist:
+    """Test refresh-token rotation against the blacklist."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_filter(self):
+        revoked_tokens.reset()
+        yield
+        revoked_tokens.reset()
+
+    def test_rotated_token_is_rejected(self, api_client, user, django_capture_on_commit_callbacks):
+        """Test that a refresh token cannot be used again after rotation."""
+        token = RefreshToken.for_user(user)
+        refresh = str(token)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/api/auth/token/refresh/', {'refresh': refresh})
+        assert response.status_code == status.HTTP_200_OK
+        assert BlacklistedToken.objects.filter(token__jti=token['jti']).exists()
+
+        response = api_client.post('/api/auth/token/refresh/', {'refresh': refresh})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_version_is_bumped_on_commit(self, user, django_capture_on_commit_callbacks):
+        """Test that other processes are told only once the blacklisted row is visible."""
+        version = get_blacklist_version()
+        with django_capture_on_commit_callbacks() as callbacks:
+            RefreshToken.for_user(user).blacklist()
+            assert get_blacklist_version() == version
+
+        for callback in callbacks:
+            callback()
+        assert get_blacklist_version() != version
+
+    def test_rows_committed_out_of_id_order(self, user):
+        """Test that a row with a lower id committed after a later one is still loaded."""
+        early, late = RefreshToken.for_user(user), RefreshToken.for_user(user)
+        revoked_tokens.refresh()
+
+        def commit(token, row_id):
+            BlacklistedToken.objects.create(
+                id=row_id, token=OutstandingToken.objects.get(jti=token['jti'])
+            )
+            bump_blacklist_version()
+            revoked_tokens.refresh()
+
+        commit(late, 1001)
+        commit(early, 1000)
+
+        assert revoked_tokens.might_contain(early['jti'])
+        assert revoked_tokens.might_contain(late['jti'])
+
+    def test_incremental_load_runs_outside_lock(self, user):
+        """Test that other threads can check tokens while new rows are loaded."""
+        token = RefreshToken.for_user(user)
+        revoked_tokens.refresh()
+        token.blacklist()
+        bump_blacklist_version()
+
+        locked = []
+
+        def record_lock(execute, sql, params, many, context):
+            if 'token_blacklist_blacklistedtoken' in sql:
+                locked.append(revoked_tokens.lock.locked())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record_lock):
+            assert revoked_tokens.might_contain(token['jti'])
+        assert locked == [False]
+
+    def test_unrevoked_token_skips_blacklist_query(self, api_client, user):
+        """Test that the filter answers for tokens that were never revoked."""
+        revoked_tokens.refresh()
+        refresh = str(RefreshToken.for_user(user))
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.post('/api/auth/token/refresh/', {'refresh': refresh})
+
+        assert response.status_code == status.HTTP_200_OK
+        lookups = [
+            query for query in context.captured_queries
+            if 'token_blacklist_blacklistedtoken' in query['sql'] and query['sql'].startswith('SELECT')
+            and 'jti' in query['sql']
+        ]
+        assert lookups == []
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added value is reported as present."""
+        bloom = BloomFilter(1000, 0.01)
+        values = [f'jti-{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+
+        assert all(value in bloom for value in values)
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        assert false_positives < 300
+
+
 @pytest.mark.django_db
 class TestPhotoEndpoints:
     """Test photo API endpoints."""
@@ -170,3 +349,1027 @@ class TestPhotoEndpoints:
         
         assert response.status_code == status.HTTP_200_OK
         assert response.data['message'] == 'Photo is already in favorites'
+
+
+@pytest.mark.django_db
+class TestFavoritedQueryCount:
+    """Test that is_favorited is resolved without per-row queries."""
+    
+    def test_list_query_count_is_constant(
+        self, authenticated_client, user, django_capture_on_commit_callbacks
+    ):
+        """Test that the list query count does not grow with page size."""
+        for pexels_id in range(1, 3):
+            PhotoFavorite.objects.create(user=user, photo=create_photo(pexels_id))
+        small_page = count_queries(authenticated_client, '/api/photos/')
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            for pexels_id in range(3, 18):
+                photo = create_photo(pexels_id)
+                if pexels_id % 2:
+                    PhotoFavorite.objects.create(user=user, photo=photo)
+        full_page = count_queries(authenticated_client, '/api/photos/')
+        
+        assert small_page == full_page
+    
+    def test_favorites_query_count_is_constant(self, authenticated_client, user):
+        """Test that the favorites query count does not grow with page size."""
+        PhotoFavorite.objects.create(user=user, photo=create_photo(1))
+        small_page = count_queries(authenticated_client, '/api/photos/favorites/')
+        
+        for pexels_id in range(2, 18):
+            PhotoFavorite.objects.create(user=user, photo=create_photo(pexels_id))
+        full_page = count_queries(authenticated_client, '/api/photos/favorites/')
+        
+        assert small_page == full_page
+    
+    def test_list_reports_favorited_flags(self, authenticated_client, user):
+        """Test that the annotated flags match the user's favorites."""
+        favorite = create_photo(1)
+        other = create_photo(2)
+        PhotoFavorite.objects.create(user=user, photo=favorite)
+        
+        response = authenticated_client.get('/api/photos/')
+        
+        flags = {row['id']: row['is_favorited'] for row in response.data['results']}
+        assert flags == {favorite.id: True, other.id: False}
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    """Test the versioned list/detail response cache."""
+    
+    def test_repeat_list_is_served_from_cache(self, authenticated_client):
+        """Test that a cached page only costs the favorites overlay query."""
+        for pexels_id in range(1, 6):
+            create_photo(pexels_id)
+        first = count_queries(authenticated_client, '/api/photos/')
+        second = count_queries(authenticated_client, '/api/photos/')
+        
+        assert second == 1
+        assert first > second
+    
+    def test_favorited_flags_are_per_user(self, authenticated_client, user):
+        """Test that a page cached for one user shows another user's favorites."""
+        favorite = create_photo(1)
+        other = create_photo(2)
+        PhotoFavorite.objects.create(user=user, photo=favorite)
+        authenticated_client.get('/api/photos/')
+        authenticated_client.get(f'/api/photos/{favorite.id}/')
+        
+        other_user = User.objects.create_user(username='other', password='testpass123')
+        PhotoFavorite.objects.create(user=other_user, photo=other)
+        other_client = APIClient()
+        other_client.force_authenticate(user=other_user)
+        
+        listed = other_client.get('/api/photos/')
+        detail = other_client.get(f'/api/photos/{favorite.id}/')
+        
+        flags = {row['id']: row['is_favorited'] for row in listed.data['results']}
+        assert flags == {favorite.id: False, other.id: True}
+        assert detail.data['is_favorited'] is False
+    
+    def test_photo_changes_invalidate(
+        self, authenticated_client, photo, django_capture_on_commit_callbacks
+    ):
+        """Test that saving or deleting a photo bumps the catalog version on commit."""
+        authenticated_client.get(f'/api/photos/{photo.id}/')
+        photo.alt = 'Updated alt text'
+        with django_capture_on_commit_callbacks() as callbacks:
+            photo.save()
+        
+        assert authenticated_client.get(f'/api/photos/{photo.id}/').data['alt'] == 'Test photo'
+        for callback in callbacks:
+            callback()
+        response = authenticated_client.get(f'/api/photos/{photo.id}/')
+        assert response.data['alt'] == 'Updated alt text'
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            photo.delete()
+        response = authenticated_client.get('/api/photos/')
+        assert response.data['count'] == 0
+    
+    def test_favorites_filter_is_not_cached(self, authenticated_client, user, photo):
+        """Test that user-specific ?favorites=true pages bypass the cache."""
+        authenticated_client.get('/api/photos/?favorites=true')
+        PhotoFavorite.objects.create(user=user, photo=photo)
+        
+        response = authenticated_client.get('/api/photos/?favorites=true')
+        assert response.data['count'] == 1
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Test ETag / Last-Modified validation for photos and favorites."""
+    
+    def test_retrieve_not_modified(self, authenticated_client, photo):
+        """Test that a matching If-None-Match skips serialization."""
+        url = f'/api/photos/{photo.id}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        with CaptureQueriesContext(connection) as context:
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+        assert not response.content
+        assert len(context.captured_queries) == 1
+    
+    def test_retrieve_if_modified_since(self, authenticated_client, photo):
+        """Test that an unchanged photo is not modified since its Last-Modified."""
+        url = f'/api/photos/{photo.id}/'
+        last_modified = authenticated_client.get(url)['Last-Modified']
+        
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_retrieve_etag_follows_changes(
+        self, authenticated_client, photo, django_capture_on_commit_callbacks
+    ):
+        """Test that photo updates and favoriting change the ETag."""
+        url = f'/api/photos/{photo.id}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        authenticated_client.post(f'/api/photos/{photo.id}/favorite/')
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['is_favorited'] is True
+        
+        photo.alt = 'Updated alt text'
+        with django_capture_on_commit_callbacks(execute=True):
+            photo.save()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['alt'] == 'Updated alt text'
+    
+    def test_favorites_etag_follows_favorite_set(self, authenticated_client, user, photo):
+        """Test that adding or removing a favorite changes the favorites ETag."""
+        url = '/api/photos/favorites/'
+        etag = authenticated_client.get(url)['ETag']
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+        
+        PhotoFavorite.objects.create(user=user, photo=photo)
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 1
+        
+        PhotoFavorite.objects.filter(user=user).delete()
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == status.HTTP_200_OK
+    
+    def test_favorite_count_changes_validators(self, authenticated_client, user, photo):
+        """Test that another user's favorite changes the detail and favorites ETags."""
+        PhotoFavorite.objects.create(user=user, photo=photo)
+        detail_etag = authenticated_client.get(f'/api/photos/{photo.id}/')['ETag']
+        favorites_etag = authenticated_client.get('/api/photos/favorites/')['ETag']
+        
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='other', password='pass12345'))
+        other.post(f'/api/photos/{photo.id}/favorite/')
+        
+        response = authenticated_client.get(f'/api/photos/{photo.id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['favorite_count'] == 1
+        response = authenticated_client.get('/api/photos/favorites/', HTTP_IF_NONE_MATCH=favorites_etag)
+        assert response.status_code == status.HTTP_200_OK
+    
+    def test_favorites_etag_depends_on_page(self, authenticated_client, user):
+        """Test that different pages of favorites get different ETags."""
+        for pexels_id in range(1, 25):
+            PhotoFavorite.objects.create(user=user, photo=create_photo(pexels_id))
+        
+        first = authenticated_client.get('/api/photos/favorites/')
+        second = authenticated_client.get('/api/photos/favorites/?page=2')
+        
+        assert first['ETag'] != second['ETag']
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    """Test ?fields= output and column projection."""
+    
+    GRID_FIELDS = 'id,src_tiny,avg_color,width,height'
+    
+    def test_list_returns_requested_fields(self, authenticated_client, photo):
+        """Test that only the requested fields are serialized."""
+        response = authenticated_client.get(f'/api/photos/?fields={self.GRID_FIELDS}')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data['results'][0]) == set(self.GRID_FIELDS.split(','))
+    
+    def test_projection_reaches_sql(self, authenticated_client, photo):
+        """Test that unrequested columns are not selected."""
+        with CaptureQueriesContext(connection) as context:
+            authenticated_client.get(f'/api/photos/?fields={self.GRID_FIELDS}')
+        
+        select = next(q['sql'] for q in context.captured_queries if 'src_tiny' in q['sql'])
+        assert 'src_original' not in select
+        assert 'search_vector' not in select
+        assert 'EXISTS' not in select
+    
+    def test_id_is_always_included(self, authenticated_client, photo):
+        """Test that responses always identify the photo."""
+        response = authenticated_client.get(f'/api/photos/{photo.id}/?fields=alt,is_favorited')
+        
+        assert response.data == {'id': photo.id, 'alt': photo.alt, 'is_favorited': False}
+    
+    def test_unknown_field_is_rejected(self, authenticated_client, photo):
+        """Test that fields outside the serializer are a 400."""
+        response = authenticated_client.get('/api/photos/?fields=id,password')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'fields' in response.data['error']['details']
+    
+    def test_cursor_pages_without_ordering_fields(self, authenticated_client):
+        """Test that the cursor still works when created_at is not requested."""
+        for pexels_id in range(1, 26):
+            create_photo(pexels_id)
+        url = '/api/photos/?cursor=&fields=id'
+        
+        first = authenticated_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            second = authenticated_client.get(first.data['next'])
+        
+        assert len(first.data['results']) + len(second.data['results']) == 25
+        assert len(context.captured_queries) == 1
+    
+    def test_favorites_fields(self, authenticated_client, user, photo):
+        """Test that favorites honour ?fields= in both pagination modes."""
+        PhotoFavorite.objects.create(user=user, photo=photo)
+        
+        for url in ('/api/photos/favorites/', '/api/photos/favorites/?cursor='):
+            response = authenticated_client.get(f'{url}{"&" if "?" in url else "?"}fields=src_tiny,is_favorited')
+            assert response.data['results'] == [
+                {'id': photo.id, 'src_tiny': photo.src_tiny, 'is_favorited': True}
+            ]
+
+
+@pytest.mark.django_db
+class TestFastSerialization:
+    """Test that the values() fast path matches the serializer byte for byte."""
+    
+    URLS = [
+        '/api/photos/',
+        '/api/photos/?page=2',
+        '/api/photos/?cursor=',
+        '/api/photos/?cursor=&ordering=pexels_id',
+        '/api/photos/?search=forest',
+        '/api/photos/?fields=id,src_tiny,image_url,created_at',
+        '/api/photos/favorites/',
+        '/api/photos/favorites/?cursor=',
+        '/api/photos/favorites/?fields=alt,is_favorited',
+        '/api/photos/favorites/?cursor=&fields=image_url',
+        '/api/photos/?w=300&dpr=2',
+        '/api/photos/?fields=rendition,srcset',
+        '/api/photos/favorites/?cursor=&w=200',
+    ]
+    
+    @pytest.fixture
+    def catalog(self, user):
+        for pexels_id in range(1, 26):
+            photo = create_photo(
+                pexels_id,
+                alt=f'Forest \u2028 caf\u00e9 \U0001F332 "{pexels_id}"\n',
+                image=f'photos/{pexels_id}_medium.jpg' if pexels_id % 3 else '',
+            )
+            if pexels_id % 2:
+                PhotoFavorite.objects.create(user=user, photo=photo)
+        Photo.objects.filter(pexels_id__lte=10).update(rendition_index=[
+            {'w': 320, 'name': 'renditions/1/320w.webp'},
+            {'w': 640, 'url': 'https://images.pexels.com/photos/1/a.jpeg?h=350'},
+        ])
+    
+    def test_output_is_identical(self, authenticated_client, catalog, settings):
+        """Test every list and favorites variant against the serializer path."""
+        settings.PHOTO_RESPONSE_CACHE_TIMEOUT = 0
+        for url in self.URLS:
+            settings.PHOTO_FAST_SERIALIZATION = False
+            expected = authenticated_client.get(url)
+            settings.PHOTO_FAST_SERIALIZATION = True
+            actual = authenticated_client.get(url)
+            
+            assert expected.status_code == status.HTTP_200_OK
+            assert actual.content == expected.content, url
+    
+    def test_list_query_count(self, authenticated_client, catalog, settings):
+        """Test that the fast path issues the same queries as the serializer."""
+        settings.PHOTO_RESPONSE_CACHE_TIMEOUT = 0
+        settings.PHOTO_FAST_SERIALIZATION = False
+        expected = count_queries(authenticated_client, '/api/photos/')
+        settings.PHOTO_FAST_SERIALIZATION = True
+        
+        assert count_queries(authenticated_client, '/api/photos/') == expected
+
+
+@pytest.mark.django_db
+class TestExport:
+    """Test the NDJSON catalog export."""
+    
+    def read_lines(self, response):
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.splitlines()]
+    
+    def test_requires_auth(self, api_client):
+        """Test that the export is authenticated."""
+        response = api_client.get('/api/photos/export/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_streams_every_photo(self, authenticated_client, settings):
+        """Test that all photos are streamed across cursor chunks."""
+        settings.PHOTO_EXPORT_CHUNK_SIZE = 7
+        for pexels_id in range(1, 31):
+            create_photo(pexels_id)
+        
+        response = authenticated_client.get('/api/photos/export/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = self.read_lines(response)
+        assert sorted(row['pexels_id'] for row in rows) == list(range(1, 31))
+        assert set(rows[0]) == set(PhotoListSerializer.Meta.fields) - set(PhotoListSerializer.optional_fields)
+    
+    def test_honors_filters(self, authenticated_client):
+        """Test the photographer and photographer_id filters."""
+        create_photo(1, photographer='Alice', photographer_id=10)
+        create_photo(2, photographer='Bob', photographer_id=20)
+        create_photo(3, photographer='Alice', photographer_id=30)
+        
+        by_name = self.read_lines(authenticated_client.get('/api/photos/export/?photographer=alice'))
+        by_id = self.read_lines(
+            authenticated_client.get('/api/photos/export/?photographer_id=30&fields=pexels_id')
+        )
+        
+        assert sorted(row['pexels_id'] for row in by_name) == [1, 3]
+        assert by_id == [{'id': by_id[0]['id'], 'pexels_id': 3}]
+    
+    def test_gzip(self, authenticated_client, photo):
+        """Test that the stream is gzipped when the client accepts it."""
+        response = authenticated_client.get('/api/photos/export/', HTTP_ACCEPT_ENCODING='gzip, br')
+        
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        assert [row['pexels_id'] for row in self.read_lines(response)] == [photo.pexels_id]
+    
+    def test_gzip_refused_by_q_value(self, authenticated_client, photo):
+        """Test that gzip;q=0 and a refused wildcard keep the stream uncompressed."""
+        for header in ('gzip;q=0, br', 'br, *;q=0', 'identity', 'GZIP; q=0.5'):
+            response = authenticated_client.get('/api/photos/export/', HTTP_ACCEPT_ENCODING=header)
+            compressed = response.get('Content-Encoding') == 'gzip'
+            assert compressed == (header == 'GZIP; q=0.5'), header
+            assert [row['pexels_id'] for row in self.read_lines(response)] == [photo.pexels_id]
+    
+    def test_accepts_ndjson(self, authenticated_client, photo):
+        """Test that clients may ask for the media type the export returns."""
+        response = authenticated_client.get('/api/photos/export/', HTTP_ACCEPT='application/x-ndjson')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert [row['pexels_id'] for row in self.read_lines(response)] == [photo.pexels_id]
+        
+        response = authenticated_client.get(
+            '/api/photos/export/?fields=nope', HTTP_ACCEPT='application/x-ndjson'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.content.endswith(b'}\n')
+
+
+def analyze_photos():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE photos_photo')
+
+
+@pytest.mark.django_db
+class TestEstimatedCount:
+    """Test planner-estimated counts for large unfiltered lists."""
+    
+    @pytest.fixture(autouse=True)
+    def catalog(self, settings):
+        settings.PHOTO_ESTIMATED_COUNT_THRESHOLD = 10
+        for pexels_id in range(1, 13):
+            create_photo(pexels_id, photographer='Alice' if pexels_id % 2 else 'Bob')
+    
+    def test_unfiltered_list_uses_estimate(self, authenticated_client):
+        """Test that no COUNT(*) runs once the table is analyzed and large."""
+        analyze_photos()
+        with CaptureQueriesContext(connection) as context:
+            response = authenticated_client.get('/api/photos/')
+        
+        assert response.data['count'] == 12
+        assert response.data['count_is_exact'] is False
+        assert not any('COUNT(' in query['sql'] for query in context.captured_queries)
+    
+    def test_underestimate_serves_tail_pages(self, authenticated_client):
+        """Test that rows inserted since the last ANALYZE stay reachable."""
+        analyze_photos()
+        for pexels_id in range(13, 38):
+            create_photo(pexels_id)
+        
+        first = authenticated_client.get('/api/photos/')
+        last = authenticated_client.get('/api/photos/?page=2')
+        
+        assert first.data['next'] is not None
+        assert last.status_code == status.HTTP_200_OK
+        assert len(last.data['results']) == 17
+        assert last.data['count'] == 37
+        assert last.data['count_is_exact'] is True
+        assert authenticated_client.get('/api/photos/?page=3').status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_filtered_list_is_exact(self, authenticated_client):
+        """Test that filtered result sets are counted exactly."""
+        analyze_photos()
+        response = authenticated_client.get('/api/photos/?photographer=alice')
+        
+        assert response.data['count'] == 6
+        assert response.data['count_is_exact'] is True
+    
+    def test_small_table_is_exact(self, authenticated_client, settings):
+        """Test that tables below the threshold are counted exactly."""
+        analyze_photos()
+        settings.PHOTO_ESTIMATED_COUNT_THRESHOLD = 1000
+        response = authenticated_client.get('/api/photos/')
+        
+        assert response.data['count'] == 12
+        assert response.data['count_is_exact'] is True
+    
+    def test_admin_uses_estimate(self, client):
+        """Test that the photo changelist paginates with the estimate."""
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        analyze_photos()
+        
+        response = client.get('/admin/photos/photo/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.context['cl'].paginator.count_is_exact is False
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    """Test opt-in cursor pagination."""
+    
+    def collect_pages(self, client, url):
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_list_walks_all_photos(self, authenticated_client):
+        """Test that following next links returns every photo once, newest first."""
+        photos = [create_photo(pexels_id) for pexels_id in range(1, 26)]
+        
+        ids = self.collect_pages(authenticated_client, '/api/photos/?cursor=')
+        
+        assert ids == [photo.id for photo in reversed(photos)]
+    
+    def test_cursor_with_photographer_filter(self, authenticated_client):
+        """Test that cursor pagination keeps the photographer filter."""
+        create_photo(1, photographer='Alice')
+        bob = create_photo(2, photographer='Bob', photographer_id=2)
+        
+        ids = self.collect_pages(authenticated_client, '/api/photos/?cursor=&photographer=bob')
+        
+        assert ids == [bob.id]
+    
+    def test_favorites_ordered_by_favorite_time(self, authenticated_client, user):
+        """Test that favorites pages follow the time each photo was favorited."""
+        photos = [create_photo(pexels_id) for pexels_id in range(1, 24)]
+        for photo in reversed(photos):
+            PhotoFavorite.objects.create(user=user, photo=photo)
+        
+        response = authenticated_client.get('/api/photos/favorites/?cursor=')
+        ids = self.collect_pages(authenticated_client, '/api/photos/favorites/?cursor=')
+        
+        assert len(response.data['results']) == 20
+        assert all(row['is_favorited'] for row in response.data['results'])
+        assert ids == [photo.id for photo in photos]
+
+
+@pytest.mark.django_db
+class TestFullTextSearch:
+    """Test full-text search behind the search parameter."""
+    
+    def search(self, client, term, **params):
+        response = client.get('/api/photos/', {'search': term, **params})
+        assert response.status_code == status.HTTP_200_OK
+        return [row['id'] for row in response.data['results']]
+    
+    def test_prefix_match_on_alt(self, authenticated_client):
+        """Test that partial words match alt text."""
+        lake = create_photo(1, alt='A small island in the middle of a lake')
+        create_photo(2, alt='Two older people cycling')
+        
+        assert self.search(authenticated_client, 'isla') == [lake.id]
+    
+    def test_all_terms_must_match(self, authenticated_client):
+        """Test that multiple terms are combined with AND."""
+        create_photo(1, alt='Mountain lake')
+        both = create_photo(2, alt='Mountain lake at sunset')
+        
+        assert self.search(authenticated_client, 'lake sunset') == [both.id]
+    
+    def test_photographer_ranks_above_alt(self, authenticated_client):
+        """Test that photographer matches rank above alt text matches."""
+        by_felix = create_photo(1, photographer='Felix', alt='Forest')
+        about_felix = create_photo(2, photographer='Anna', alt='Felix the cat')
+        
+        assert self.search(authenticated_client, 'felix') == [by_felix.id, about_felix.id]
+    
+    def test_explicit_ordering_overrides_rank(self, authenticated_client):
+        """Test that ?ordering= takes precedence over relevance."""
+        by_felix = create_photo(1, photographer='Felix', alt='Forest')
+        about_felix = create_photo(2, photographer='Anna', alt='Felix the cat')
+        
+        ids = self.search(authenticated_client, 'felix', ordering='-pexels_id')
+        
+        assert ids == [about_felix.id, by_felix.id]
+    
+    def test_numeric_term_matches_photographer_id(self, authenticated_client):
+        """Test that numeric terms match photographer_id."""
+        photo = create_photo(1, photographer_id=57767809)
+        create_photo(2, photographer_id=2)
+        
+        assert self.search(authenticated_client, '57767809') == [photo.id]
+    
+    def test_numeric_term_is_and_ed_with_other_terms(self, authenticated_client):
+        """Test that a photographer_id match still requires the other terms."""
+        lake = create_photo(1, photographer_id=123, alt='Mountain lake')
+        create_photo(2, photographer_id=123, alt='Desert road')
+        create_photo(3, photographer_id=4, alt='Mountain lake')
+        
+        assert self.search(authenticated_client, 'lake 123') == [lake.id]
+    
+    def test_vector_follows_updates(self, authenticated_client, photo):
+        """Test that saving a photo refreshes its search vector."""
+        photo.alt = 'Sunrise over dunes'
+        photo.save()
+        
+        assert self.search(authenticated_client, 'dunes') == [photo.id]
+    
+    def test_unchanged_save_skips_refresh(self, photo):
+        """Test that saves leaving photographer, alt and sizes alone skip the derived columns."""
+        stored = Photo.objects.get(pk=photo.pk)
+        with CaptureQueriesContext(connection) as context:
+            Photo.objects.update_or_create(pexels_id=photo.pexels_id, defaults={'alt': photo.alt})
+            stored.image = 'photos/1_large.jpg'
+            stored.save()
+        
+        # update_search_vector() and refresh_rendition_index()'s bulk_update
+        assert not [query for query in context.captured_queries if 'to_tsvector' in query['sql']]
+        assert not [query for query in context.captured_queries if 'CASE WHEN' in query['sql']]
+    
+    def test_reverted_change_is_refreshed(self, authenticated_client, photo):
+        """Test that changing alt back after a save still refreshes the vector."""
+        original = photo.alt
+        photo.alt = 'Sunrise over dunes'
+        photo.save()
+        photo.alt = original
+        photo.save()
+        
+        assert self.search(authenticated_client, 'dunes') == []
+
+
+@pytest.fixture
+def photographer_trgm_index(db):
+    """Create the pg_trgm index from migration 0005 (tests run without migrations)."""
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        pytest.skip('pg_trgm extension is not available')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX photos_photo_photographer_trgm '
+            'ON photos_photo USING gin (UPPER(photographer) gin_trgm_ops)'
+        )
+
+
+def explain_without_seqscan(queryset):
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
+@pytest.mark.django_db
+class TestPhotographerFilter:
+    """Test the indexed photographer filter paths."""
+    
+    def filter_ids(self, client, **params):
+        response = client.get('/api/photos/', params)
+        assert response.status_code == status.HTTP_200_OK
+        return [row['id'] for row in response.data['results']]
+    
+    def test_match_modes(self, authenticated_client):
+        """Test contains, prefix and exact matching."""
+        felix = create_photo(1, photographer='Felix')
+        felixa = create_photo(2, photographer='Felixa Maria')
+        create_photo(3, photographer='Anna Felix')
+        
+        assert len(self.filter_ids(authenticated_client, photographer='felix')) == 3
+        assert set(self.filter_ids(
+            authenticated_client, photographer='Felix', photographer_match='prefix'
+        )) == {felix.id, felixa.id}
+        assert self.filter_ids(
+            authenticated_client, photographer='Felix', photographer_match='exact'
+        ) == [felix.id]
+    
+    def test_invalid_match_mode(self, authenticated_client, photo):
+        """Test that unknown match modes are rejected."""
+        response = authenticated_client.get(
+            '/api/photos/', {'photographer': 'Test', 'photographer_match': 'regex'}
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_contains_uses_trigram_index(self, photographer_trgm_index, photo):
+        """Test that the default contains filter is served by the trigram index."""
+        plan = explain_without_seqscan(
+            Photo.objects.filter(photographer__icontains='photog')
+        )
+        
+        assert 'photos_photo_photographer_trgm' in plan
+    
+    def test_prefix_uses_btree_index(self, photo):
+        """Test that the prefix fast path is served by a B-tree index."""
+        plan = explain_without_seqscan(
+            Photo.objects.filter(photographer__startswith='Test')
+        )
+        
+        assert 'Index' in plan and 'photographer' in plan
+        assert 'Seq Scan' not in plan
+
+
+@pytest.mark.django_db
+class TestFavoriteCounts:
+    """Test the denormalized favorite_count and popularity ordering."""
+    
+    def favorite_count(self, photo):
+        photo.refresh_from_db(fields=['favorite_count'])
+        return photo.favorite_count
+    
+    def test_favorite_updates_count(self, authenticated_client, photo):
+        """Test that adding and removing a favorite moves the count once."""
+        url = f'/api/photos/{photo.id}/favorite/'
+        authenticated_client.post(url)
+        authenticated_client.post(url)
+        assert self.favorite_count(photo) == 1
+        
+        authenticated_client.delete(url)
+        authenticated_client.delete(url)
+        assert self.favorite_count(photo) == 0
+    
+    def test_cached_counts_are_overlaid(self, authenticated_client, photo):
+        """Test that cached responses show new counts without a catalog bump."""
+        other = create_photo(2, favorite_count=1)
+        detail_url = f'/api/photos/{photo.id}/'
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 0
+        assert authenticated_client.get('/api/photos/popular/').data[0]['id'] == other.id
+        version = get_catalog_version()
+        
+        other_client = APIClient()
+        other_client.force_authenticate(user=User.objects.create_user(username='other', password='testpass123'))
+        authenticated_client.post(f'{detail_url}favorite/')
+        other_client.post(f'{detail_url}favorite/')
+        
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 2
+        popular = authenticated_client.get('/api/photos/popular/').data
+        assert [(row['id'], row['favorite_count']) for row in popular] == [(photo.id, 2), (other.id, 1)]
+        
+        authenticated_client.delete(f'{detail_url}favorite/')
+        
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 1
+        assert get_catalog_version() == version
+    
+    def test_ordering_by_favorite_count(self, authenticated_client):
+        """Test ?ordering=-favorite_count with ties broken by id."""
+        first = create_photo(pexels_id=1, favorite_count=5)
+        second = create_photo(pexels_id=2, favorite_count=9)
+        third = create_photo(pexels_id=3, favorite_count=5)
+        
+        response = authenticated_client.get('/api/photos/?ordering=-favorite_count')
+        
+        ids = [result['id'] for result in response.data['results']]
+        assert ids == [second.id, third.id, first.id]
+        assert response.data['results'][0]['favorite_count'] == 9
+    
+    def test_popular(self, authenticated_client):
+        """Test the top-N endpoint and its limit validation."""
+        photos = [create_photo(pexels_id=index, favorite_count=index) for index in range(1, 5)]
+        
+        response = authenticated_client.get('/api/photos/popular/?limit=2')
+        assert response.status_code == status.HTTP_200_OK
+        assert [result['id'] for result in response.data] == [photos[3].id, photos[2].id]
+        
+        response = authenticated_client.get('/api/photos/popular/?limit=1000')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_popular_uses_index(self, photo):
+        """Test that the top-N query reads the (favorite_count, id) index."""
+        plan = explain_without_seqscan(Photo.objects.order_by('-favorite_count', '-id')[:10])
+        
+        assert 'favorit' in plan and 'Index' in plan
+        assert 'Sort' not in plan
+
+
+@pytest.mark.django_db
+class TestBulkFavorites:
+    """Test adding and removing many favorites in one request."""
+    
+    url = '/api/photos/favorites/bulk/'
+    
+    def statuses(self, response):
+        assert response.status_code == status.HTTP_200_OK
+        return [(result['id'], result['status']) for result in response.data['results']]
+    
+    def test_add_and_remove(self, authenticated_client, user):
+        """Test per-ID results and favorite counts for both directions."""
+        photos = [create_photo(pexels_id=index) for index in range(1, 4)]
+        PhotoFavorite.objects.create(user=user, photo=photos[0])
+        ids = [photo.id for photo in photos]
+        missing = max(ids) + 1
+        
+        response = authenticated_client.post(
+            self.url, {'photo_ids': [*ids, missing, ids[1]]}, format='json'
+        )
+        assert self.statuses(response) == [
+            (ids[0], 'already_favorited'), (ids[1], 'added'), (ids[2], 'added'), (missing, 'not_found'),
+        ]
+        assert set(user.favorites.values_list('photo_id', flat=True)) == set(ids)
+        
+        response = authenticated_client.delete(self.url, {'photo_ids': [ids[1], missing]}, format='json')
+        assert self.statuses(response) == [(ids[1], 'removed'), (missing, 'not_favorited')]
+        counts = dict(Photo.objects.values_list('id', 'favorite_count'))
+        assert [counts[photo_id] for photo_id in ids] == [0, 0, 1]
+    
+    def test_constant_queries(self, authenticated_client):
+        """Test that the query count does not grow with the number of IDs."""
+        ids = [create_photo(pexels_id=index).id for index in range(1, 51)]
+        
+        def queries(method, photo_ids):
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(authenticated_client, method)(
+                    self.url, {'photo_ids': photo_ids}, format='json'
+                )
+            assert response.status_code == status.HTTP_200_OK
+            return len(context.captured_queries)
+        
+        # The first change also creates the user's FavoritesVersion row
+        queries('post', ids[:1])
+        assert queries('post', ids[1:6]) == queries('post', ids[6:])
+        assert queries('delete', ids[1:6]) == queries('delete', ids[6:])
+    
+    def test_concurrent_insert_is_not_counted(self, authenticated_client, user):
+        """Test that a favorite inserted by another request mid-call is neither counted nor added."""
+        racing, other = create_photo(pexels_id=1), create_photo(pexels_id=2)
+        raced = []
+        
+        def insert_first(execute, sql, params, many, context):
+            if sql.startswith('INSERT') and PhotoFavorite._meta.db_table in sql and not raced:
+                raced.append(racing)
+                PhotoFavorite.objects.create(user=user, photo=racing)
+            return execute(sql, params, many, context)
+        
+        with connection.execute_wrapper(insert_first):
+            response = authenticated_client.post(
+                self.url, {'photo_ids': [racing.id, other.id]}, format='json'
+            )
+        
+        assert raced
+        assert self.statuses(response) == [(racing.id, 'already_favorited'), (other.id, 'added')]
+        counts = dict(Photo.objects.values_list('id', 'favorite_count'))
+        assert (counts[racing.id], counts[other.id]) == (0, 1)
+    
+    def test_cached_counts_are_overlaid(self, authenticated_client, photo):
+        """Test that cached detail responses show counts changed in bulk."""
+        detail_url = f'/api/photos/{photo.id}/'
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 0
+        version = get_catalog_version()
+        
+        authenticated_client.post(self.url, {'photo_ids': [photo.id]}, format='json')
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 1
+        
+        authenticated_client.delete(self.url, {'photo_ids': [photo.id]}, format='json')
+        assert authenticated_client.get(detail_url).data['favorite_count'] == 0
+        assert get_catalog_version() == version
+    
+    def test_invalidates_favorites_validators(self, authenticated_client, photo):
+        """Test that bulk changes change the favorites ETag."""
+        etag = authenticated_client.get('/api/photos/favorites/')['ETag']
+        authenticated_client.post(self.url, {'photo_ids': [photo.id]}, format='json')
+        
+        assert authenticated_client.get('/api/photos/favorites/')['ETag'] != etag
+    
+    def test_rejects_invalid_ids(self, authenticated_client):
+        """Test that an empty or non-integer ID list is rejected."""
+        for photo_ids in ([], ['a'], [0]):
+            response = authenticated_client.post(self.url, {'photo_ids': photo_ids}, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestBatchRetrieve:
+    """Test fetching many photos by ID in one request."""
+    
+    url = '/api/photos/batch/'
+    
+    def test_request_order_and_not_found(self, authenticated_client, user):
+        """Test that results follow the request order and mark missing IDs."""
+        first, second = create_photo(pexels_id=1), create_photo(pexels_id=2)
+        PhotoFavorite.objects.create(user=user, photo=second)
+        missing = second.id + 1
+        
+        response = authenticated_client.get(f'{self.url}?ids={second.id},{missing},{first.id},{second.id}')
+        
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [result['id'] for result in results] == [second.id, missing, first.id]
+        assert results[0]['is_favorited'] is True
+        assert results[0]['pexels_id'] == 2
+        assert results[1] == {'id': missing, 'status': 'not_found'}
+        assert results[2]['is_favorited'] is False
+    
+    def test_post_body_and_fields(self, authenticated_client, photo):
+        """Test the POST form with a sparse fieldset."""
+        response = authenticated_client.post(
+            f'{self.url}?fields=pexels_id', {'ids': [photo.id]}, format='json'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [{'id': photo.id, 'pexels_id': photo.pexels_id}]
+    
+    def test_single_query(self, authenticated_client):
+        """Test that photos and favorite flags load in one query however many IDs."""
+        ids = [create_photo(pexels_id=index).id for index in range(1, 31)]
+        
+        def photo_queries(photo_ids):
+            with CaptureQueriesContext(connection) as context:
+                response = authenticated_client.get(f'{self.url}?ids={",".join(map(str, photo_ids))}')
+            assert response.status_code == status.HTTP_200_OK
+            return [query for query in context.captured_queries if 'photos_photo' in query['sql']]
+        
+        assert len(photo_queries(ids[:2])) == len(photo_queries(ids)) == 1
+    
+    def test_id_limits(self, authenticated_client):
+        """Test that missing, malformed and oversized ID lists are rejected."""
+        too_many = ','.join(str(index) for index in range(1, 102))
+        for query in ('', '?ids=', '?ids=a,b', f'?ids={too_many}'):
+            response = authenticated_client.get(f'{self.url}{query}')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, query
+
+
+@pytest.mark.django_db
+class TestRenditions:
+    """Test best-fit renditions and srcset from the rendition index."""
+    
+    PEXELS = 'https://images.pexels.com/photos/1/pexels-photo-1.jpeg?auto=compress&cs=tinysrgb'
+    
+    @pytest.fixture
+    def sized_photo(self):
+        photo = create_photo(
+            src_original=self.PEXELS.split('?')[0],
+            src_large2x=f'{self.PEXELS}&dpr=2&h=650&w=940',
+            src_large=f'{self.PEXELS}&h=650&w=940',
+            src_medium=f'{self.PEXELS}&h=350',
+            src_small=f'{self.PEXELS}&h=130',
+            src_portrait=f'{self.PEXELS}&fit=crop&h=1200&w=800',
+        )
+        PhotoRendition.objects.create(
+            photo=photo, format='webp', target_width=640, width=640, height=360,
+            file='renditions/1/640w.webp', size=1,
+        )
+        refresh_rendition_index(Photo.objects.filter(pk=photo.pk))
+        photo.refresh_from_db()
+        return photo
+    
+    def test_pexels_widths(self):
+        """Test the served width of resized, original and cropped Pexels URLs."""
+        assert pexels_width(f'{self.PEXELS}&dpr=2&h=650&w=940', 3888, 5184) == 975
+        assert pexels_width(f'{self.PEXELS}&h=350', 1920, 1080) == 622
+        assert pexels_width(self.PEXELS.split('?')[0], 1920, 1080) == 1920
+        assert pexels_width(f'{self.PEXELS}&fit=crop&h=200&w=280', 1920, 1080) is None
+    
+    def test_index_is_sorted_and_prefers_stored(self, sized_photo):
+        """Test that the index is narrowest first, without crops, and stored files win ties."""
+        index = sized_photo.rendition_index
+        assert [entry['w'] for entry in index] == [231, 622, 640, 940, 1880, 1920]
+        assert index[2] == {'w': 640, 'name': 'renditions/1/640w.webp'}
+        assert best_fit(index, 600)['w'] == 622
+        assert best_fit(index, 5000)['w'] == 1920
+        assert best_fit([], 100) is None
+    
+    def test_best_fit_for_width_and_dpr(self, authenticated_client, sized_photo):
+        """Test that ?w= and ?dpr= pick the smallest rendition that covers them."""
+        response = authenticated_client.get(f'/api/photos/{sized_photo.id}/?w=320&dpr=2')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['rendition']['width'] == 640
+        assert '/renditions/1/640w.webp' in response.data['rendition']['url']
+        srcset = response.data['srcset'].split(', ')
+        assert len(srcset) == 6
+        assert srcset[0] == f'{self.PEXELS}&h=130 231w'
+        
+        response = authenticated_client.get(f'/api/photos/{sized_photo.id}/?w=1000&dpr=1.5')
+        assert response.data['rendition']['width'] == 1880
+    
+    def test_list_endpoints(self, authenticated_client, user, sized_photo):
+        """Test that list endpoints add renditions to sized requests only."""
+        PhotoFavorite.objects.create(user=user, photo=sized_photo)
+        
+        for url in ('/api/photos/', '/api/photos/favorites/'):
+            assert 'rendition' not in authenticated_client.get(url).data['results'][0], url
+            photo = authenticated_client.get(f'{url}?w=900').data['results'][0]
+            assert photo['rendition']['width'] == 940, url
+            assert photo['is_favorited'] is True
+        popular = authenticated_client.get('/api/photos/popular/?w=900').data
+        assert popular[0]['rendition']['width'] == 940
+    
+    def test_rendition_only_fieldset(self, authenticated_client, sized_photo):
+        """Test that ?fields= can ask for the rendition alone."""
+        response = authenticated_client.get(f'/api/photos/{sized_photo.id}/?fields=rendition&w=100')
+        
+        assert response.data == {
+            'id': sized_photo.id, 'rendition': {'url': f'{self.PEXELS}&h=130', 'width': 231},
+        }
+    
+    def test_invalid_sizes(self, authenticated_client, photo):
+        """Test that out-of-range or malformed sizes are rejected."""
+        for query in ('w=0', 'w=abc', 'w=20000', 'w=100&dpr=9', 'w=100&dpr=nan', 'dpr=2'):
+            response = authenticated_client.get(f'/api/photos/?{query}')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, query
+
+
+@pytest.fixture
+def replica(settings):
+    """A second alias on the test database, standing in for a read replica."""
+    connections.settings['replica'] = {**connection.settings_dict}
+    settings.DATABASE_REPLICAS = ['replica']
+    yield connections['replica']
+    connections['replica'].close()
+    del connections['replica']
+    del connections.settings['replica']
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReadReplicas:
+    """Test routing of reads to replicas and writes to the primary."""
+
+    def test_reads_use_replica(self, authenticated_client, photo, replica):
+        """Test that list, retrieve, search and export queries run on the replica."""
+        for url in (
+            '/api/photos/',
+            f'/api/photos/{photo.id}/',
+            '/api/photos/?search=Test',
+            '/api/photos/export/',
+        ):
+            with CaptureQueriesContext(connection) as primary, \
+                    CaptureQueriesContext(replica) as replica_queries:
+                response = authenticated_client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            assert response.status_code == status.HTTP_200_OK, url
+            assert replica_queries.captured_queries, url
+            assert not primary.captured_queries, url
+
+    def test_writes_and_later_reads_use_primary(self, authenticated_client, photo, replica):
+        """Test that favoriting reads and writes on the primary only."""
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(replica) as replica_queries:
+            response = authenticated_client.post(f'/api/photos/{photo.id}/favorite/')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert primary.captured_queries
+        assert not replica_queries.captured_queries
+
+    def test_safe_request_pins_after_write(self, photo, replica):
+        """Test that a read following a write in the same context uses the primary."""
+        router = PrimaryReplicaRouter()
+        with replica_reads():
+            assert router.db_for_read(Photo) == 'replica'
+            assert router.db_for_write(Photo) == 'default'
+            assert router.db_for_read(Photo) == 'default'
+        with replica_reads():
+            assert router.db_for_read(Photo) == 'replica'
+
+    def test_transactions_and_commands_use_primary(self, photo, replica):
+        """Test that reads outside requests or inside transactions use the primary."""
+        router = PrimaryReplicaRouter()
+        assert router.db_for_read(Photo) == 'default'
+        with replica_reads(), transaction.atomic():
+            assert router.db_for_read(Photo) == 'default'
+
+    def test_replicas_are_load_balanced(self, photo, replica, settings):
+        """Test that requests are spread across every replica, one replica each."""
+        settings.DATABASE_REPLICAS = ['replica', 'replica_2']
+        router = PrimaryReplicaRouter()
+        chosen = set()
+        for _ in range(100):
+            with replica_reads():
+                aliases = {router.db_for_read(Photo) for _ in range(10)}
+            assert len(aliases) == 1
+            chosen |= aliases
+        assert chosen == {'replica', 'replica_2'}
@@ -1,18 +1,64 @@
 """
 Views for the photo API.
 """
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from .cache import overlay_favorites, response_cache_key, response_cache_timeout
+from .conditional import conditional_response, favorites_validators, photo_validators
+from .export import accepts_gzip, gzip_chunks, ndjson_chunks
+from .fastpath import RowPlan
+from .favorites import add_favorites, remove_favorites
+from .filters import PHOTOGRAPHER_MATCH_LOOKUPS, PhotoOrderingFilter, PhotoSearchFilter
 from .models import Photo, PhotoFavorite
-from .serializers import PhotoSerializer, PhotoListSerializer, UserSerializer
+from .pagination import EstimatedCountPagination, FavoriteCursorPagination, PhotoCursorPagination
+from .renderers import FastJSONRenderer, NDJSONRenderer
+from .renditions import requested_width
+from .serializers import (
+    BATCH_MAX_IDS, BulkFavoriteSerializer, PhotoBatchSerializer, PhotoSerializer,
+    PhotoListSerializer, UserSerializer,
+)
+
+
+FIELDS_PARAMETER = openapi.Parameter(
+    'fields', openapi.IN_QUERY,
+    description="Comma-separated fields to return (id is always included)",
+    type=openapi.TYPE_STRING,
+)
+
+POPULAR_DEFAULT_LIMIT = 10
+POPULAR_MAX_LIMIT = 100
+
+# Bounds for the ?w= and ?dpr= rendition sizing parameters
+RENDITION_MAX_WIDTH = 10000
+RENDITION_MIN_DPR = 0.5
+RENDITION_MAX_DPR = 4
+
+RENDITION_PARAMETERS = [
+    openapi.Parameter('w', openapi.IN_QUERY, description=f"Display width in CSS pixels (1 to {RENDITION_MAX_WIDTH}); adds the best-fit rendition and srcset", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('dpr', openapi.IN_QUERY, description=f"Device pixel ratio for w (default 1, {RENDITION_MIN_DPR} to {RENDITION_MAX_DPR})", type=openapi.TYPE_NUMBER),
+]
+
+PHOTOGRAPHER_PARAMETERS = [
+    openapi.Parameter('photographer', openapi.IN_QUERY, description="Filter by photographer name", type=openapi.TYPE_STRING),
+    openapi.Parameter('photographer_match', openapi.IN_QUERY, description="How to match photographer: contains (default, case-insensitive), prefix or exact", type=openapi.TYPE_STRING, enum=list(PHOTOGRAPHER_MATCH_LOOKUPS)),
+    openapi.Parameter('photographer_id', openapi.IN_QUERY, description="Filter by photographer ID", type=openapi.TYPE_INTEGER),
+]
 
 
 class RegisterView(APIView):
@@ -42,28 +88,173 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
     
     list: List all photos with pagination and filtering
     retrieve: Get a single photo by ID
+    batch: Get many photos by ID
     search: Search photos by photographer or alt text
     favorites: List user's favorite photos
+    bulk_favorite: Add or remove many favorites at once
+    popular: List the most favorited photos
     """
     queryset = Photo.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [PhotoOrderingFilter, PhotoSearchFilter]
     search_fields = ['photographer', 'alt', 'photographer_id']
-    ordering_fields = ['created_at', 'pexels_id', 'photographer']
-    ordering = ['-created_at']
+    ordering_fields = ['created_at', 'pexels_id', 'photographer', 'favorite_count']
+    ordering = ['-created_at', '-id']
+    pagination_class = EstimatedCountPagination
+    cursor_pagination_class = PhotoCursorPagination
+    
+    @property
+    def paginator(self):
+        """Use keyset pagination when the client opts in with ?cursor=."""
+        if not hasattr(self, '_paginator') and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+    
+    def uses_cursor_pagination(self):
+        request = getattr(self, 'request', None)
+        return (
+            request is not None
+            and self.cursor_pagination_class.cursor_query_param in request.query_params
+        )
+    
+    def uses_response_cache(self):
+        """Cache shared catalog pages; ?favorites=true is specific to the user."""
+        favorites_only = self.request.query_params.get('favorites', '')
+        return response_cache_timeout() > 0 and favorites_only.lower() != 'true'
+    
+    def cached_response(self, handler, request, *args, **kwargs):
+        """
+        Serve ``handler``'s response from the versioned response cache.
+        
+        Cached data holds the favorite counts and whichever user's
+        ``is_favorited`` values built it, so both are replaced on every hit.
+        ``popular`` is re-sorted by the current counts; which photos it
+        holds can lag by up to the cache timeout.
+        """
+        if not self.uses_response_cache():
+            return handler(request, *args, **kwargs)
+        
+        key = response_cache_key(self.action, request)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, response_cache_timeout())
+            return response
+        
+        if self.action == 'retrieve':
+            photos = [data]
+        elif isinstance(data, dict):
+            photos = data['results']
+        else:
+            photos = data
+        overlay_favorites(photos, request.user)
+        if self.action == 'popular' and photos and 'favorite_count' in photos[0]:
+            photos.sort(key=lambda photo: (-photo['favorite_count'], -photo['id']))
+        return Response(data)
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'favorites', 'export', 'popular'):
             return PhotoListSerializer
         return PhotoSerializer
     
+    def get_rendition_width(self):
+        """Device pixels wanted from ``?w=`` and ``?dpr=``, or None if unsized."""
+        request = getattr(self, 'request', None)
+        params = request.query_params if request is not None else {}
+        if 'w' not in params:
+            if 'dpr' in params:
+                raise ValidationError({'w': 'Required with dpr.'})
+            return None
+        try:
+            width = int(params['w'])
+        except ValueError:
+            width = 0
+        if not 1 <= width <= RENDITION_MAX_WIDTH:
+            raise ValidationError({'w': f'Must be an integer from 1 to {RENDITION_MAX_WIDTH}.'})
+        try:
+            dpr = float(params.get('dpr', 1))
+        except ValueError:
+            dpr = 0
+        if not RENDITION_MIN_DPR <= dpr <= RENDITION_MAX_DPR:
+            raise ValidationError({'dpr': f'Must be a number from {RENDITION_MIN_DPR} to {RENDITION_MAX_DPR}.'})
+        return requested_width(width, dpr)
+    
+    def get_requested_fields(self):
+        """
+        Field names from ``?fields=``, or None to return the default fields.
+        
+        A sized request (``?w=``) without ``?fields=`` gets every field,
+        including ``rendition`` and ``srcset``.
+        """
+        request = getattr(self, 'request', None)
+        value = request.query_params.get('fields') if request is not None else None
+        if value is None:
+            if self.get_rendition_width() is None:
+                return None
+            return list(self.get_serializer_class().Meta.fields)
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        allowed = self.get_serializer_class().Meta.fields
+        if not fields or any(name not in allowed for name in fields):
+            raise ValidationError({
+                'fields': f'Must be a comma-separated list of: {", ".join(allowed)}.'
+            })
+        # Always identify the photo, e.g. for the cached is_favorited overlay
+        if 'id' not in fields:
+            fields.insert(0, 'id')
+        return fields
+    
+    def uses_fast_serialization(self):
+        return getattr(settings, 'PHOTO_FAST_SERIALIZATION', True)
+    
+    def get_row_plan(self, prefix=''):
+        """Fast-path equivalent of ``get_serializer(many=True)``."""
+        return RowPlan(
+            self.get_serializer_class(), self.get_requested_fields(), self.request, prefix,
+            rendition_width=self.get_rendition_width(),
+        )
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['rendition_width'] = self.get_rendition_width()
+        return context
+    
+    def project(self, queryset):
+        """Load only the columns the requested fields and the ordering need."""
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset.defer('search_vector', 'rendition_index')
+        
+        columns = self.get_serializer_class().columns_for(fields)
+        ordering = queryset.query.order_by or Photo._meta.ordering
+        concrete = {field.name for field in Photo._meta.concrete_fields}
+        columns.update(name.lstrip('-') for name in ordering if name.lstrip('-') in concrete)
+        return queryset.only(*columns)
+    
+    def filter_queryset(self, queryset):
+        return self.project(super().filter_queryset(queryset))
+    
     def get_queryset(self):
         queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is None or 'is_favorited' in fields:
+            queryset = queryset.with_favorited(self.request.user)
         
         # Filter by photographer if provided
         photographer = self.request.query_params.get('photographer', None)
         if photographer:
-            queryset = queryset.filter(photographer__icontains=photographer)
+            match = self.request.query_params.get('photographer_match', 'contains')
+            lookup = PHOTOGRAPHER_MATCH_LOOKUPS.get(match)
+            if lookup is None:
+                raise ValidationError({
+                    'photographer_match': f'Must be one of: {", ".join(PHOTOGRAPHER_MATCH_LOOKUPS)}.'
+                })
+            queryset = queryset.filter(**{lookup: photographer})
         
         # Filter by photographer_id if provided
         photographer_id = self.request.query_params.get('photographer_id', None)
@@ -82,14 +273,82 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
     
     @swagger_auto_schema(
         manual_parameters=[
-            openapi.Parameter('photographer', openapi.IN_QUERY, description="Filter by photographer name", type=openapi.TYPE_STRING),
-            openapi.Parameter('photographer_id', openapi.IN_QUERY, description="Filter by photographer ID", type=openapi.TYPE_INTEGER),
+            *PHOTOGRAPHER_PARAMETERS,
             openapi.Parameter('favorites', openapi.IN_QUERY, description="Show only favorites", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('search', openapi.IN_QUERY, description="Search in photographer and alt text", type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Use cursor pagination (pass an empty value for the first page)", type=openapi.TYPE_STRING),
+            FIELDS_PARAMETER,
+            *RENDITION_PARAMETERS,
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return self.cached_response(self.list_response, request, *args, **kwargs)
+    
+    def list_response(self, request, *args, **kwargs):
+        if not self.uses_fast_serialization():
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_row_plan()
+        # The cursor is built from the ordering columns of the last row
+        ordering = []
+        if self.uses_cursor_pagination():
+            ordering = self.paginator.get_ordering(request, queryset, self)
+        values = plan.values(queryset, *(name.lstrip('-') for name in ordering))
+        
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(plan.rows(page))
+        return Response(plan.rows(values))
+    
+    @swagger_auto_schema(manual_parameters=[FIELDS_PARAMETER, *RENDITION_PARAMETERS])
+    def retrieve(self, request, *args, **kwargs):
+        handler = super().retrieve
+        
+        def respond():
+            return self.cached_response(handler, request, *args, **kwargs)
+        
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        validators = photo_validators(
+            self.filter_queryset(self.get_queryset()), kwargs[lookup_url_kwarg], request
+        )
+        if validators is None:
+            return respond()
+        return conditional_response(request, validators, respond)
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, description=f"Comma-separated photo IDs (at most {BATCH_MAX_IDS})", type=openapi.TYPE_STRING, required=True),
+            FIELDS_PARAMETER,
+            *RENDITION_PARAMETERS,
+        ],
+        responses={200: 'Photos in request order; missing IDs as {"id": ..., "status": "not_found"}'},
+    )
+    @swagger_auto_schema(
+        method='post',
+        request_body=PhotoBatchSerializer,
+        manual_parameters=[FIELDS_PARAMETER, *RENDITION_PARAMETERS],
+        responses={200: 'Photos in request order; missing IDs as {"id": ..., "status": "not_found"}'},
+    )
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request):
+        """Get many photos by ID in one query, in request order."""
+        if request.method == 'GET':
+            ids = request.query_params.get('ids', '')
+            data = {'ids': [value.strip() for value in ids.split(',') if value.strip()]}
+        else:
+            data = request.data
+        serializer = PhotoBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        
+        # is_favorited comes from the EXISTS annotation in the same query
+        photos = self.project(self.get_queryset().filter(id__in=ids).order_by())
+        found = {item['id']: item for item in self.get_serializer(photos, many=True).data}
+        return Response({
+            'results': [found.get(photo_id, {'id': photo_id, 'status': 'not_found'}) for photo_id in ids]
+        })
     
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, pk=None):
@@ -97,10 +356,13 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
         photo = self.get_object()
         
         if request.method == 'POST':
-            favorite, created = PhotoFavorite.objects.get_or_create(
-                user=request.user,
-                photo=photo
-            )
+            with transaction.atomic():
+                favorite, created = PhotoFavorite.objects.get_or_create(
+                    user=request.user,
+                    photo=photo
+                )
+                if created:
+                    Photo.objects.filter(pk=photo.pk).adjust_favorite_count(1)
             if created:
                 return Response(
                     {'message': 'Photo added to favorites'},
@@ -112,10 +374,13 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         elif request.method == 'DELETE':
-            deleted = PhotoFavorite.objects.filter(
-                user=request.user,
-                photo=photo
-            ).delete()
+            with transaction.atomic():
+                deleted = PhotoFavorite.objects.filter(
+                    user=request.user,
+                    photo=photo
+                ).delete()
+                if deleted[0]:
+                    Photo.objects.filter(pk=photo.pk).adjust_favorite_count(-1)
             if deleted[0]:
                 return Response(
                     {'message': 'Photo removed from favorites'},
@@ -126,17 +391,141 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    @swagger_auto_schema(
+        methods=['post', 'delete'],
+        request_body=BulkFavoriteSerializer,
+        responses={200: 'Per-ID results: added, already_favorited, removed, not_favorited or not_found'},
+    )
+    @action(detail=False, methods=['post', 'delete'], url_path='favorites/bulk')
+    def bulk_favorite(self, request):
+        """Add or remove many photos from favorites in one request."""
+        serializer = BulkFavoriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        photo_ids = serializer.validated_data['photo_ids']
+        
+        if request.method == 'POST':
+            results = add_favorites(request.user, photo_ids)
+        else:
+            results = remove_favorites(request.user, photo_ids)
+        return Response({
+            'results': [{'id': photo_id, 'status': result} for photo_id, result in results.items()]
+        })
+    
+    @swagger_auto_schema(manual_parameters=[FIELDS_PARAMETER, *RENDITION_PARAMETERS])
     @action(detail=False, methods=['get'])
     def favorites(self, request):
         """List all photos favorited by the current user."""
-        favorite_photos = Photo.objects.filter(
+        return conditional_response(
+            request, favorites_validators(request), lambda: self.favorites_response(request)
+        )
+    
+    def favorites_response(self, request):
+        fast = self.uses_fast_serialization()
+        if self.uses_cursor_pagination():
+            paginator = FavoriteCursorPagination()
+            if fast:
+                plan = self.get_row_plan(prefix='photo__')
+                favorites = plan.values(
+                    PhotoFavorite.objects.filter(user=request.user).annotate(is_favorited=Value(True)),
+                    *(name.lstrip('-') for name in paginator.ordering),
+                )
+                page = paginator.paginate_queryset(favorites, request, view=self)
+                return paginator.get_paginated_response(plan.rows(page))
+            
+            favorites = PhotoFavorite.objects.filter(
+                user=request.user
+            ).select_related('photo')
+            fields = self.get_requested_fields()
+            if fields is not None:
+                columns = PhotoListSerializer.columns_for(fields)
+                favorites = favorites.only(
+                    'id', 'created_at', 'photo', *(f'photo__{column}' for column in columns)
+                )
+            else:
+                favorites = favorites.defer('photo__search_vector', 'photo__rendition_index')
+            page = paginator.paginate_queryset(favorites, request, view=self)
+            photos = [favorite.photo for favorite in page]
+            for photo in photos:
+                photo.is_favorited = True
+            serializer = self.get_serializer(photos, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
+        favorite_photos = self.project(Photo.objects.filter(
             favorited_by__user=request.user
-        ).distinct()
+        ).distinct().annotate(is_favorited=Value(True)))
+        
+        if fast:
+            plan = self.get_row_plan()
+            values = plan.values(favorite_photos)
+            page = self.paginate_queryset(values)
+            if page is not None:
+                return self.get_paginated_response(plan.rows(page))
+            return Response(plan.rows(values))
         
         page = self.paginate_queryset(favorite_photos)
         if page is not None:
-            serializer = PhotoListSerializer(page, many=True, context={'request': request})
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
-        serializer = PhotoListSerializer(favorite_photos, many=True, context={'request': request})
+        serializer = self.get_serializer(favorite_photos, many=True)
         return Response(serializer.data)
+    
+    @swagger_auto_schema(
+        manual_parameters=[
+            *PHOTOGRAPHER_PARAMETERS,
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Number of photos (default {POPULAR_DEFAULT_LIMIT}, at most {POPULAR_MAX_LIMIT})", type=openapi.TYPE_INTEGER),
+            FIELDS_PARAMETER,
+            *RENDITION_PARAMETERS,
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """List the most favorited photos, read from the favorite_count index."""
+        return self.cached_response(self.popular_response, request)
+    
+    def popular_response(self, request):
+        try:
+            limit = int(request.query_params.get('limit', POPULAR_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= POPULAR_MAX_LIMIT:
+            raise ValidationError({'limit': f'Must be an integer from 1 to {POPULAR_MAX_LIMIT}.'})
+        
+        queryset = self.project(
+            self.get_queryset().order_by('-favorite_count', '-id')
+        )[:limit]
+        if self.uses_fast_serialization():
+            plan = self.get_row_plan()
+            return Response(plan.rows(plan.values(queryset)))
+        return Response(self.get_serializer(queryset, many=True).data)
+    
+    @swagger_auto_schema(
+        manual_parameters=[
+            *PHOTOGRAPHER_PARAMETERS,
+            FIELDS_PARAMETER,
+            *RENDITION_PARAMETERS,
+        ],
+        responses={200: 'Newline-delimited JSON, one photo per line (gzip with Accept-Encoding: gzip)'},
+    )
+    @action(
+        detail=False, methods=['get'],
+        renderer_classes=[FastJSONRenderer, NDJSONRenderer, BrowsableAPIRenderer],
+    )
+    def export(self, request):
+        """Stream every matching photo as newline-delimited JSON."""
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_row_plan()
+        values = plan.values(queryset)
+        # The body is streamed after the request finishes; route the read now
+        values = values.using(values.db)
+        chunks = ndjson_chunks(values, plan, getattr(settings, 'PHOTO_EXPORT_CHUNK_SIZE', 2000))
+        
+        gzip = accepts_gzip(request)
+        response = StreamingHttpResponse(
+            gzip_chunks(chunks) if gzip else chunks,
+            content_type='application/x-ndjson',
+        )
+        if gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
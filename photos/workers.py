@@ -0,0 +1,28 @@
+"""
+Helpers shared by the process-pool pipelines (ingest_photos --workers and
+generate_renditions).
+
+Each pool task returns a plain result dict, so failures cross the process
+boundary as counters and a capped list of messages instead of exceptions.
+"""
+import django
+
+# Error messages kept per chunk; the rest are only counted
+MAX_REPORTED_ERRORS = 10
+
+
+def init_worker():
+    """Process pool initializer; a no-op under fork, sets up Django under spawn."""
+    django.setup()
+
+
+def chunk_result(index, *counters):
+    """Result dict for chunk ``index`` with each of ``counters`` at zero."""
+    return {'index': index, **dict.fromkeys(counters, 0), 'error_count': 0, 'errors': []}
+
+
+def record_error(result, message):
+    """Count an error in ``result``, keeping its message while under the cap."""
+    result['error_count'] += 1
+    if len(result['errors']) < MAX_REPORTED_ERRORS:
+        result['errors'].append(message)